@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+#
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measure how long concretizing a spec takes as the number of variants,
+and of variants that are conditional on other variants, grows::
+
+    python benchmarks/concretize.py --variants 100 200 400
+"""
+
+import argparse
+import pathlib
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "lib"))
+
+import benchpark.spec  # noqa: E402
+import benchpark.variant  # noqa: E402
+
+
+def synthetic_class(n):
+    """A class with ``n`` variants: half unconditional, and half in a chain
+    where each one is only defined when the previous one has its default.
+    """
+    variants = {benchpark.spec.Spec(): {}}
+    for i in range(n // 2):
+        name = f"plain{i}"
+        variants[benchpark.spec.Spec()][name] = benchpark.variant.Variant(
+            name, "a", "", values=("a", "b")
+        )
+    previous = "plain0"
+    for i in range(n - n // 2):
+        name = f"chained{i}"
+        when = benchpark.spec.Spec(f"{previous}=a")
+        variants[when] = {
+            name: benchpark.variant.Variant(name, "a", "", values=("a", "b"))
+        }
+        previous = name
+
+    return type(f"Synthetic{n}", (), {"variants": variants, "namespace": "bench"})
+
+
+def concrete_spec_type(cls):
+    class SyntheticSpec(benchpark.spec.ConcreteSpec):
+        @property
+        def object_class(self):
+            return cls
+
+    return SyntheticSpec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.variants:
+        spec_type = concrete_spec_type(synthetic_class(n))
+        spec = spec_type("synthetic plain1=b")
+        assert len(spec.variants) == n
+
+        seconds = min(
+            timeit.repeat(
+                lambda: spec_type("synthetic plain1=b"), number=args.number, repeat=3
+            )
+        )
+        print(f"{n:>6} variants {1000 * seconds / args.number:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measure spec parsing and ``Spec.satisfies`` throughput, with and
+without the cache in ``benchpark.spec.parse_template``::
+
+    python benchmarks/spec_parse.py --number 20000
+"""
+
+import argparse
+import pathlib
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "lib"))
+
+import benchpark.spec  # noqa: E402
+
+#: The kind of literals experiments check over and over
+LITERALS = [
+    "programming_model=openmp",
+    "programming_model=cuda",
+    "programming_model=rocm",
+    "experiment=strong",
+    "workload=problem1",
+    "amg2023 programming_model=openmp experiment=weak",
+    "+caliper",
+]
+
+
+def parse_all():
+    for literal in LITERALS:
+        benchpark.spec.Spec(literal)
+
+
+def satisfies_all(spec):
+    for literal in LITERALS:
+        spec.satisfies(literal)
+
+
+def run(label, number):
+    spec = benchpark.spec.Spec("amg2023 programming_model=openmp experiment=weak")
+    benchmarks = {
+        "parse": parse_all,
+        "satisfies": lambda: satisfies_all(spec),
+    }
+    for name, fn in benchmarks.items():
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        rate = number * len(LITERALS) / seconds
+        print(f"{name:<10}{label:<10}{rate:>14,.0f} /s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=10000)
+    args = parser.parse_args()
+
+    cached = benchpark.spec.parse_template
+    run("cached", args.number)
+    try:
+        benchpark.spec.parse_template = cached.__wrapped__
+        run("uncached", args.number)
+    finally:
+        benchpark.spec.parse_template = cached
+
+
+if __name__ == "__main__":
+    main()
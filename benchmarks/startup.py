@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+#
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measure the startup cost of ``bin/benchpark`` for common commands.
+
+Each command is timed when launched through ``bin/benchpark`` (which runs
+``lib/main.py`` in-process) and through a launcher that re-executes Python
+to run ``lib/main.py`` (how ``bin/benchpark`` used to work)::
+
+    python benchmarks/startup.py --repeat 10
+
+``system init`` and ``experiment init`` need Ramble, so they require a
+bootstrapped ``~/.benchpark``; use ``--commands list`` to skip them.
+"""
+
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+benchpark_root = pathlib.Path(__file__).resolve().parents[1]
+benchpark_exe = benchpark_root / "bin" / "benchpark"
+main_py = benchpark_root / "lib" / "main.py"
+
+#: The launcher bin/benchpark used before it ran main.py in-process
+SUBPROCESS_LAUNCHER = (
+    "import subprocess, sys; "
+    "subprocess.run([sys.executable] + sys.argv[1:], check=True)"
+)
+
+
+def command_args(name, workdir):
+    if name == "list":
+        return ["list"]
+    elif name == "system-init":
+        return ["system", "init", "--basedir", str(workdir), "cts"]
+    elif name == "experiment-init":
+        return ["experiment", "init", "--basedir", str(workdir), "saxpy"]
+    raise ValueError(f"Unknown command: {name}")
+
+
+def time_once(launch, args):
+    start = time.perf_counter()
+    subprocess.run(launch + args, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--commands",
+        nargs="+",
+        default=["list", "system-init", "experiment-init"],
+        choices=["list", "system-init", "experiment-init"],
+    )
+    args = parser.parse_args()
+
+    launchers = {
+        "in-process": [sys.executable, str(benchpark_exe)],
+        "subprocess": [sys.executable, "-c", SUBPROCESS_LAUNCHER, str(main_py)],
+    }
+
+    print(f"{'command':<18}{'launcher':<12}{'min (s)':>10}{'median (s)':>12}")
+    for name in args.commands:
+        for launcher, launch in launchers.items():
+            times = []
+            for _ in range(args.repeat):
+                # init commands refuse to overwrite existing output
+                with tempfile.TemporaryDirectory() as workdir:
+                    times.append(time_once(launch, command_args(name, workdir)))
+            print(
+                f"{name:<18}{launcher:<12}"
+                f"{min(times):>10.3f}{statistics.median(times):>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+#
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measure how long ``benchpark setup`` takes to link a large config tree
+into a workspace, the first time and when it is already up to date::
+
+    python benchmarks/symlink_tree.py --dirs 500 --files 20
+"""
+
+import argparse
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "lib"))
+
+import benchpark.cmd.setup as setup  # noqa: E402
+
+
+def make_tree(root, dirs, files):
+    """A config tree where half of the directories hold .yaml files and the
+    other half hold only other files (e.g. scripts and READMEs).
+    """
+    for d in range(dirs):
+        subdir = root / f"group{d % 10}" / f"dir{d}"
+        subdir.mkdir(parents=True)
+        suffix = ".yaml" if d % 2 == 0 else ".txt"
+        for f in range(files):
+            (subdir / f"file{f}{suffix}").write_text("")
+
+
+def walk_symlink_tree(src, dst, include_fn):
+    """How setup linked trees before: os.walk every directory, and mkdir
+    each one on the way.
+    """
+    for src_subdir, directories, files in os.walk(src):
+        relative_src_dir = pathlib.Path(os.path.relpath(src_subdir, src))
+        dst_dir = pathlib.Path(dst) / relative_src_dir
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        for x in files:
+            if include_fn(x):
+                os.symlink(os.path.join(src_subdir, x), dst_dir / x)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40}{1000 * (time.perf_counter() - start):>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=500)
+    parser.add_argument("--files", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    try:
+        src = tmp / "configs"
+        make_tree(src, args.dirs, args.files)
+        print(f"{args.dirs} directories, {args.dirs * args.files} files")
+
+        walk_dst = tmp / "walk"
+        timed(
+            "first setup, os.walk",
+            lambda: walk_symlink_tree(src, walk_dst, setup.include_yaml),
+        )
+
+        dst = tmp / "workspace"
+
+        def sync(link_dirs=False):
+            links = setup.tree_links(src, dst, setup.include_yaml, link_dirs=link_dirs)
+            return setup.sync_links(links, [dst])
+
+        added, _, _ = timed("first setup", sync)
+        timed("rerun, nothing changed", sync)
+        print(f"{len(added)} links")
+
+        shutil.rmtree(dst)
+        setup._manifest.cache_clear()
+        added, _, _ = timed("first setup, linking directories", lambda: sync(True))
+        print(f"{len(added)} links")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Measure how long ``ramble workspace setup`` takes for a Benchpark
+workspace as the experiment matrix grows, with and without the allocation
+modifier's expansion cache::
+
+    python benchmarks/workspace_setup.py --values 4 8 16
+
+The saxpy/openmp experiment is set up for a system, and then each variable
+it defines is given ``--values`` values, so the matrix has about
+``values ** 3`` experiments. This needs a bootstrapped ``~/.benchpark``.
+"""
+
+import argparse
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+benchpark_root = pathlib.Path(__file__).resolve().parents[1]
+benchpark_exe = benchpark_root / "bin" / "benchpark"
+
+
+def widen_matrix(ramble_yaml, values):
+    """Replace the (symlinked) ramble.yaml of a workspace with a copy where
+    each experiment variable has ``values`` values.
+    """
+    with open(ramble_yaml) as f:
+        config = yaml.safe_load(f)
+
+    experiments = config["ramble"]["applications"]["saxpy"]["workloads"]["problem"][
+        "experiments"
+    ]
+    count = 0
+    for experiment in experiments.values():
+        variables = experiment["variables"]
+        # n_ranks_per_node and n_nodes are zipped, and crossed with the
+        # n x omp_num_threads matrix
+        variables["n_ranks_per_node"] = [str(i % 8 + 1) for i in range(values)]
+        variables["n_nodes"] = [str(i + 1) for i in range(values)]
+        variables["omp_num_threads"] = [str(i + 1) for i in range(values)]
+        variables["n"] = [str(512 * (i + 1)) for i in range(values)]
+        count += values**3
+
+    os.unlink(ramble_yaml)
+    with open(ramble_yaml, "w") as f:
+        yaml.dump(config, f)
+    return count
+
+
+def time_workspace_setup(experiments_root, workspace_dir, use_cache):
+    env = dict(os.environ, BENCHPARK_ALLOCATION_CACHE="1" if use_cache else "0")
+    command = (
+        f". {experiments_root / 'setup.sh'} && ramble --disable-progress-bar "
+        f"--workspace-dir {workspace_dir} workspace setup --dry-run"
+    )
+    start = time.perf_counter()
+    subprocess.run(
+        ["bash", "-c", command],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--values", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--system", default="nosite-x86_64")
+    args = parser.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp())
+    try:
+        experiments_root = tmp / "root"
+        subprocess.run(
+            [
+                sys.executable,
+                str(benchpark_exe),
+                "setup",
+                "saxpy/openmp",
+                args.system,
+                str(experiments_root),
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        workspace_dir = (
+            experiments_root / "saxpy" / "openmp" / args.system / "workspace"
+        )
+        ramble_yaml = workspace_dir / "configs" / "ramble.yaml"
+        pristine = ramble_yaml.resolve()
+
+        print(f"{'experiments':>12}{'uncached':>12}{'cached':>12}")
+        for values in args.values:
+            if ramble_yaml.is_symlink() or ramble_yaml.exists():
+                os.unlink(ramble_yaml)
+            os.symlink(pristine, ramble_yaml)
+            count = widen_matrix(ramble_yaml, values)
+
+            uncached = time_workspace_setup(experiments_root, workspace_dir, False)
+            cached = time_workspace_setup(experiments_root, workspace_dir, True)
+            print(f"{count:>12}{uncached:>11.1f}s{cached:>11.1f}s")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
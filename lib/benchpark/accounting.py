@@ -3,17 +3,25 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import functools
 import os
 
 import benchpark.paths
 
 
+# The source tree doesn't change while Benchpark runs, so list each
+# directory once
+@functools.lru_cache(maxsize=None)
+def _scandir(path):
+    return tuple((x.name, x.is_dir()) for x in os.scandir(path))
+
+
 def benchpark_experiments():
     source_dir = benchpark.paths.benchpark_root
     experiments = []
     experiments_dir = source_dir / "experiments"
-    for x in os.listdir(experiments_dir):
-        for y in os.listdir(experiments_dir / x):
+    for x, _ in _scandir(experiments_dir):
+        for y, _ in _scandir(experiments_dir / x):
             experiments.append(f"{x}/{y}")
     return experiments
 
@@ -21,7 +29,7 @@ def benchpark_experiments():
 def benchpark_modifiers():
     source_dir = benchpark.paths.benchpark_root
     modifiers = []
-    for x in os.listdir(source_dir / "modifiers"):
+    for x, _ in _scandir(source_dir / "modifiers"):
         modifiers.append(x)
     return modifiers
 
@@ -29,9 +37,7 @@ def benchpark_modifiers():
 def benchpark_systems():
     source_dir = benchpark.paths.benchpark_root
     systems = []
-    for x in os.listdir(source_dir / "configs"):
-        if not (
-            os.path.isfile(os.path.join(source_dir / "configs", x)) or x == "common"
-        ):
+    for x, is_dir in _scandir(source_dir / "configs"):
+        if is_dir and x != "common":
             systems.append(x)
     return systems
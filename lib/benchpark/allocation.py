@@ -0,0 +1,84 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Size experiments with the rules of the allocation modifier, without
+setting up a Ramble workspace.
+
+The rules live in ``modifiers/allocation/modifier.py``, which Ramble loads
+for each workspace; this loads the same file, after making Ramble
+importable (see ``benchpark.runtime.bootstrap``).
+"""
+
+import functools
+import importlib.util
+import itertools
+import pathlib
+
+import yaml
+
+import benchpark.paths
+import benchpark.runtime
+
+
+@functools.lru_cache(maxsize=None)
+def modifier():
+    """The allocation modifier, as a module."""
+    benchpark.runtime.bootstrap()
+    path = benchpark.paths.benchpark_root / "modifiers" / "allocation" / "modifier.py"
+    spec = importlib.util.spec_from_file_location("benchpark_allocation_modifier", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def system_config_dir(system):
+    """The config dir of a system, given its name under ``configs/`` or a
+    directory generated by ``benchpark system init``.
+    """
+    path = pathlib.Path(system)
+    if not path.is_dir():
+        path = benchpark.paths.benchpark_root / "configs" / system
+    if not (path / "variables.yaml").exists():
+        raise ValueError(
+            f"Invalid system {system}: must be a system ID from `benchpark "
+            "systems` or a directory containing variables.yaml"
+        )
+    return path
+
+
+def read_system_variables(system):
+    """All the variables in a system's variables.yaml, as they are written."""
+    with open(system_config_dir(system) / "variables.yaml", "r") as f:
+        data = yaml.safe_load(f) or {}
+    return data.get("variables") or {}
+
+
+def system_variables(system):
+    """The allocation options that a system sets in its variables.yaml,
+    with placeholder values removed.
+    """
+    return modifier().AttrDict.from_dict(read_system_variables(system))
+
+
+def integer_options(attr_dict):
+    return dict((var, val) for var, val in attr_dict.defined() if isinstance(val, int))
+
+
+def sweep(variables):
+    """Every combination of the values of ``variables`` (a dict of lists),
+    as a dict of equal-length lists.
+    """
+    names = list(variables)
+    rows = list(itertools.product(*(variables[x] for x in names)))
+    return dict((name, [row[i] for row in rows]) for i, name in enumerate(names))
+
+
+def solve(system, requests):
+    """Size the experiments in ``requests`` (see
+    ``solve_allocations`` in the allocation modifier) on ``system``. Options
+    given in ``requests`` take precedence over those set by the system.
+    """
+    solve_allocations = modifier().solve_allocations
+    return solve_allocations({**integer_options(system_variables(system)), **requests})
@@ -5,21 +5,30 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import filecmp
 import os
 import shutil
 import sys
 
+import yaml
+
 import benchpark.experiment
+import benchpark.index
+import benchpark.paths
+import benchpark.plan
 import benchpark.spec
 
 
 def experiment_init(args):
-    experiment_spec = benchpark.spec.ExperimentSpec(" ".join(args.spec)).concretize()
-    experiment = experiment_spec.experiment
+    spec_str = " ".join(args.spec)
+    if benchpark.spec.is_pattern(spec_str):
+        return experiment_init_many(args, spec_str)
+
+    experiment_spec = benchpark.spec.ExperimentSpec(spec_str).concretize()
 
     if args.basedir:
         base = args.basedir
-        expdir = str(hash(experiment_spec))
+        expdir = benchpark.experiment.content_hash(experiment_spec)
         destdir = os.path.join(base, expdir)
     elif args.dest:
         destdir = args.dest
@@ -27,25 +36,135 @@ def experiment_init(args):
         raise ValueError("Must specify one of: --dest, --basedir")
 
     try:
-        os.mkdir(destdir)
-        experiment.write_ramble_dict(f"{destdir}/ramble.yaml")
+        write_experiment(experiment_spec, destdir)
     except FileExistsError:
+        # Directories under --basedir are named by their content, so an
+        # unchanged one can be reused
+        if args.basedir and is_same_experiment(experiment_spec, destdir):
+            print(f"Experiment already exists ({destdir})")
+            return
         print(f"Abort: experiment description dir already exists ({destdir})")
         sys.exit(1)
+
+
+def experiment_init_many(args, pattern):
+    """Generate an experiment dir under --basedir for every valid spec that
+    the pattern expands to.
+    """
+    if not args.basedir:
+        raise ValueError("Expanding a spec pattern requires --basedir")
+
+    generated = 0
+    reused = 0
+    invalid = []
+    for spec_str, experiment_spec in benchpark.spec.concretize_expansion(pattern):
+        if isinstance(experiment_spec, Exception):
+            invalid.append((spec_str, experiment_spec))
+            continue
+
+        expdir = benchpark.experiment.content_hash(experiment_spec)
+        destdir = os.path.join(args.basedir, expdir)
+        try:
+            write_experiment(experiment_spec, destdir)
+        except FileExistsError:
+            if is_same_experiment(experiment_spec, destdir):
+                reused += 1
+            else:
+                print(f"Skipping {experiment_spec}: dir already exists ({destdir})")
+            continue
+        print(f"{experiment_spec}: {destdir}")
+        generated += 1
+
+    print(f"Generated {generated} experiment(s) under {args.basedir}")
+    if reused:
+        print(f"{reused} experiment(s) were already there and up to date")
+    if invalid:
+        print(f"Skipped {len(invalid)} invalid combination(s):")
+        for spec_str, e in invalid:
+            print(f"    {spec_str}: {e}")
+
+
+def write_experiment(experiment_spec, destdir):
+    os.mkdir(destdir)
+    try:
+        benchpark.experiment.write_cached_ramble_dict(
+            experiment_spec, f"{destdir}/ramble.yaml"
+        )
     except Exception:
         # If there was a failure, remove any partially-generated resources
         shutil.rmtree(destdir)
         raise
 
 
-def experiment_list(args):
-    experiments = benchpark.repo.all_object_names(
-        benchpark.repo.ObjectTypes.experiments
+def is_same_experiment(experiment_spec, destdir):
+    """Whether ``destdir`` holds exactly what would be generated for the spec."""
+    ramble_yaml = os.path.join(destdir, "ramble.yaml")
+    return os.path.exists(ramble_yaml) and filecmp.cmp(
+        ramble_yaml,
+        benchpark.experiment.cached_ramble_dict(experiment_spec),
+        shallow=False,
     )
+
+
+def experiment_list(args):
+    experiments = benchpark.index.experiments().names()
     # TODO: prettier printing
     print("    ".join(experiments))
 
 
+def load_ramble_dict(experiment):
+    """The ramble.yaml contents for an experiment given as a ramble.yaml, a
+    directory containing one (e.g. from `benchpark experiment init`), an
+    experiment ID from `benchpark experiments`, or an experiment spec.
+    """
+    candidates = [
+        experiment,
+        os.path.join(experiment, "ramble.yaml"),
+        os.path.join(
+            benchpark.paths.benchpark_root, "experiments", experiment, "ramble.yaml"
+        ),
+    ]
+    for path in candidates:
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                return yaml.safe_load(f)
+
+    experiment_spec = benchpark.spec.ExperimentSpec(experiment).concretize()
+    return experiment_spec.experiment.compute_ramble_dict()
+
+
+def experiment_plan(args):
+    plans = benchpark.plan.plan(load_ramble_dict(args.experiment), args.system)
+
+    total = sum(len(x.experiments) - len(x.errors) for x in plans)
+    node_hours = sum(x.node_hours for x in plans)
+    for template in plans:
+        print(template.name)
+        print(
+            f"    {len(template.experiments) - len(template.errors)} experiment(s), "
+            f"{template.excluded} excluded, {len(template.errors)} cannot be "
+            "allocated"
+        )
+        if template.n_nodes:
+            print(
+                f"    {min(template.n_nodes)} to {max(template.n_nodes)} node(s), "
+                f"{template.node_hours:.1f} node-hour(s) at most"
+            )
+        for i in sorted(template.errors)[: args.show]:
+            variables = template.experiments[i]
+            name = benchpark.plan.expand(template.name, variables)
+            print(f"    {name}: {template.errors[i]}")
+        if len(template.errors) > args.show:
+            print(f"    ... and {len(template.errors) - args.show} more")
+
+    print(
+        f"Total: {total} experiment(s) on {args.system}, "
+        f"{node_hours:.1f} node-hour(s) at most"
+    )
+    if any(x.errors for x in plans):
+        sys.exit(1)
+
+
 def setup_parser(root_parser):
     system_subparser = root_parser.add_subparsers(dest="experiment_subcommand")
 
@@ -55,15 +174,46 @@ def setup_parser(root_parser):
         "--basedir", help="Generate a system dir under this, and place all files there"
     )
 
-    init_parser.add_argument("spec", nargs="+", help="Experiment spec")
+    init_parser.add_argument(
+        "spec",
+        nargs="+",
+        help="Experiment spec. Use {a,b,...} for alternatives (e.g. "
+        "programming_model={openmp,cuda}) to generate every combination; "
+        "this requires --basedir",
+    )
 
     system_subparser.add_parser("list")
 
+    plan_parser = system_subparser.add_parser(
+        "plan",
+        help="Count the experiments that Ramble would generate on a system, "
+        "and the node-hours they could use, without setting them up",
+    )
+    plan_parser.add_argument(
+        "--show",
+        type=int,
+        default=10,
+        help="How many experiments that cannot be allocated to list for each "
+        "template (default 10)",
+    )
+    plan_parser.add_argument(
+        "experiment",
+        help="A ramble.yaml, a directory containing one (e.g. from `benchpark "
+        "experiment init`), an experiment ID from `benchpark experiments`, or "
+        "a quoted experiment spec",
+    )
+    plan_parser.add_argument(
+        "system",
+        help="A system ID from `benchpark systems`, or a directory generated "
+        "by `benchpark system init`",
+    )
+
 
 def command(args):
     actions = {
         "init": experiment_init,
         "list": experiment_list,
+        "plan": experiment_plan,
     }
     if args.experiment_subcommand in actions:
         actions[args.experiment_subcommand](args)
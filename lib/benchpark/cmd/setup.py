@@ -5,10 +5,12 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import concurrent.futures
 import os
 import pathlib
 import shutil
 import sys
+import time
 
 import yaml
 
@@ -22,42 +24,211 @@ from benchpark.debug import debug_print
 from benchpark.runtime import RuntimeResources
 
 
-# Note: it would be nice to vendor spack.llnl.util.link_tree, but that
-# involves pulling in most of llnl/util/ and spack/util/
-def symlink_tree(src, dst, include_fn=None):
-    """Like ``cp -R`` but instead of files, create symlinks"""
+def _include_all(fname):
+    return True
+
+
+def include_yaml(fname):
+    # Only include .yaml files
+    # Always exclude files that start with "."
+    if fname.startswith("."):
+        return False
+    if fname.endswith(".yaml"):
+        return True
+    return False
+
+
+#: (dir mtimes, manifest) by (src, include_fn), see _manifest
+_manifests = {}
+
+
+def _is_unchanged(dir_mtimes):
+    try:
+        return all(os.stat(x).st_mtime_ns == t for x, t in dir_mtimes.items())
+    except OSError:
+        return False
+
+
+def _manifest(src, include_fn):
+    """The files under ``src`` that ``include_fn`` accepts, as
+    ``{relative dir: (file names, complete)}``.
+
+    Directories without any such file, directly or below them, are left out.
+    ``complete`` says whether everything under the directory is included.
+    The result is reused (e.g. for each of many targets of ``benchpark
+    setup``) until the mtime of one of the directories changes, which
+    happens when entries are added to, removed from or renamed in it.
+    """
+    key = (src, include_fn)
+    if key in _manifests and _is_unchanged(_manifests[key][0]):
+        return _manifests[key][1]
+
+    manifest = {}
+    dir_mtimes = {}
+
+    def scan(path, relative):
+        files = []
+        complete = True
+        dir_mtimes[path] = os.stat(path).st_mtime_ns
+        with os.scandir(path) as entries:
+            # Like os.walk, don't descend into symlinked directories
+            subdirs = []
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.is_symlink():
+                        complete = False
+                    else:
+                        subdirs.append(entry.name)
+                elif include_fn(entry.name):
+                    files.append(entry.name)
+                else:
+                    complete = False
+
+        found = bool(files)
+        for name in sorted(subdirs):
+            sub_found, sub_complete = scan(
+                os.path.join(path, name), os.path.join(relative, name)
+            )
+            found = found or sub_found
+            complete = complete and sub_found and sub_complete
+        if found:
+            manifest[relative] = (tuple(sorted(files)), complete)
+        return found, complete
+
+    scan(src, "")
+    _manifests[key] = (dir_mtimes, manifest)
+    return manifest
+
+
+def tree_links(src, dst, include_fn=None, links=None, link_dirs=False):
+    """The symlinks that mirror the files of ``src`` under ``dst``, as
+    ``{link: target}``; ``include_fn`` selects the files by name.
+
+    If ``links`` is given, the symlinks are added to it. Two sources
+    providing the same file is an error. With ``link_dirs``, a subdirectory
+    whose files are all included is linked as a whole.
+    """
     src = os.path.abspath(src)
-    dst = os.path.abspath(dst)
+    dst = os.path.normpath(os.path.abspath(dst))
+    links = {} if links is None else links
     # By default, we include all filenames
-    include_fn = include_fn or (lambda f: True)
-    for x in [src, dst]:
-        if not os.path.isdir(x):
-            raise ValueError(f"Not a directory: {x}")
-    for src_subdir, directories, files in os.walk(src):
-        relative_src_dir = pathlib.Path(os.path.relpath(src_subdir, src))
-        dst_dir = pathlib.Path(dst) / relative_src_dir
-        dst_dir.mkdir(parents=True, exist_ok=True)
+    include_fn = include_fn or _include_all
+    if not os.path.isdir(src):
+        raise ValueError(f"Not a directory: {src}")
+
+    def add(link, target):
+        if link in links:
+            raise ValueError(f"{link} would link to both {links[link]} and {target}")
+        links[link] = target
+
+    linked_dir = None
+    for relative, (files, complete) in sorted(_manifest(src, include_fn).items()):
+        if linked_dir is not None and relative.startswith(linked_dir + os.sep):
+            continue
+        dst_dir = os.path.join(dst, relative) if relative else dst
+        src_dir = os.path.join(src, relative) if relative else src
+        if link_dirs and complete and relative:
+            linked_dir = relative
+            add(dst_dir, src_dir)
+            continue
         for x in files:
-            if not include_fn(x):
-                continue
-            dst_symlink = dst_dir / x
-            src_file = os.path.join(src_subdir, x)
-            os.symlink(src_file, dst_symlink)
+            add(os.path.join(dst_dir, x), os.path.join(src_dir, x))
+
+    if link_dirs:
+        # A file from another source can't go in a linked directory
+        dirs = set(link for link, target in links.items() if os.path.isdir(target))
+        for link in links:
+            parent = os.path.dirname(link)
+            while parent.startswith(dst + os.sep):
+                if parent in dirs:
+                    raise ValueError(f"{link} would be inside linked dir {parent}")
+                parent = os.path.dirname(parent)
+    return links
+
+
+def _existing_links(root, found):
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_symlink():
+                found.append(entry.path)
+            elif entry.is_dir():
+                _existing_links(entry.path, found)
+    return found
+
+
+def sync_links(links, roots):
+    """Make the symlinks under ``roots`` match ``links`` (``{link: target}``).
+
+    Missing links are created and links with the wrong target replaced.
+    Other symlinks under ``roots`` are removed, but nothing else: files and
+    directories that Ramble or the user created there are kept.
+
+    Returns:
+        ``(added, updated, removed)`` lists of link paths
+    """
+    existing = []
+    for root in roots:
+        if os.path.isdir(root):
+            _existing_links(str(root), existing)
+
+    removed = sorted(path for path in existing if path not in links)
+    for path in removed:
+        os.unlink(path)
+
+    existing = set(existing)
+    added, updated = [], []
+    for link, target in sorted(links.items()):
+        if link not in existing:
+            if os.path.lexists(link):
+                raise ValueError(
+                    f"Benchpark expects {link} to be a symlink, but it is not"
+                )
+            added.append(link)
+        elif os.readlink(link) != target:
+            updated.append(link)
+
+    # Create each missing directory once
+    for parent in sorted(set(os.path.dirname(link) for link in added)):
+        os.makedirs(parent, exist_ok=True)
+    for link in updated:
+        os.unlink(link)
+    for link in added + updated:
+        os.symlink(links[link], link)
+
+    return added, updated, removed
 
 
 def setup_parser(root_parser):
     root_parser.add_argument(
-        "experiment",
-        type=str,
-        help="The experiment (benchmark/ProgrammingModel) to run",
+        "targets",
+        nargs="*",
+        metavar="experiment system [experiment system ...] experiments_root",
+        help="The experiment (benchmark/ProgrammingModel) to run, the system on "
+        "which to run it (any number of these pairs), and where to install "
+        "packages and store results for the experiments. Benchpark expects to "
+        "manage experiments_root, and it should be empty/nonexistent the first "
+        "time you run benchpark setup experiments.",
     )
     root_parser.add_argument(
-        "system", type=str, help="The system on which to run the experiment"
+        "--campaign",
+        metavar="FILE",
+        help="YAML file listing experiments to set up, as 'targets' (each "
+        "with an experiment, system and optional modifier) and optionally "
+        "the 'experiments_root'. An experiments_root given on the command line "
+        "takes precedence.",
     )
     root_parser.add_argument(
-        "experiments_root",
-        type=str,
-        help="Where to install packages and store results for the experiments. Benchpark expects to manage this directory, and it should be empty/nonexistent the first time you run benchpark setup experiments.",
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="How many workspaces to set up at once",
+    )
+    root_parser.add_argument(
+        "--clean",
+        action="store_true",
+        help="Delete the existing workspace, including its experiments and "
+        "results, instead of updating it",
     )
     root_parser.add_argument(
         "--modifier",
@@ -131,7 +302,48 @@ def benchpark_check_modifier(arg_str):
     return found
 
 
-def command(args):
+class Target:
+    """One experiment on one system, with a modifier, to set up under an
+    experiments_root.
+    """
+
+    def __init__(self, experiment, system, modifier="none"):
+        self.experiment = experiment
+        self.system = system
+        self.modifier = modifier
+
+    def __str__(self):
+        return f"{self.experiment} {self.system} {self.modifier}"
+
+
+def load_campaign(path):
+    """Read a campaign file::
+
+        experiments_root: /path/to/experiments_root  # optional
+        targets:
+        - experiment: amg2023/openmp
+          system: cts1
+          modifier: caliper  # optional, default none
+    """
+    with open(path, "r") as f:
+        data = yaml.safe_load(f) or {}
+
+    targets = []
+    for entry in data.get("targets", []):
+        try:
+            targets.append(
+                Target(
+                    entry["experiment"], entry["system"], entry.get("modifier", "none")
+                )
+            )
+        except (KeyError, TypeError):
+            raise ValueError(
+                f"{path}: each target needs an experiment and a system, got {entry}"
+            )
+    return data.get("experiments_root"), targets
+
+
+def setup_workspace(experiments_root, target, clean=False, out=print):
     """
     experiments_root/
         spack/
@@ -142,32 +354,30 @@ def command(args):
                     configs/
                         (everything from source/configs/<system>)
                         (everything from source/experiments/<experiment>)
-    """
 
-    experiments_root = pathlib.Path(os.path.abspath(args.experiments_root))
-    modifier = args.modifier
+    Returns:
+        the Ramble workspace dir
+    """
+    modifier = target.modifier
     source_dir = benchpark.paths.benchpark_root
     debug_print(f"source_dir = {source_dir}")
-    experiment_id, experiment_src_dir = benchpark_check_experiment(args.experiment)
+    experiment_id, experiment_src_dir = benchpark_check_experiment(target.experiment)
     debug_print(f"specified experiment (benchmark/ProgrammingModel) = {experiment_id}")
-    system_id, configs_src_dir = benchpark_check_system(args.system)
+    system_id, configs_src_dir = benchpark_check_system(target.system)
     debug_print(f"specified system = {system_id}")
     debug_print(f"specified modifier = {modifier}")
     benchpark_check_modifier(modifier)
 
     workspace_dir = experiments_root / str(experiment_id) / str(system_id)
 
-    if workspace_dir.exists():
-        if workspace_dir.is_dir():
-            print(f"Clearing existing workspace {workspace_dir}")
-            shutil.rmtree(workspace_dir)
-        else:
-            print(
-                f"Benchpark expects to manage {workspace_dir} as a directory, but it is not"
-            )
-            sys.exit(1)
+    if workspace_dir.exists() and not workspace_dir.is_dir():
+        raise ValueError(
+            f"Benchpark expects to manage {workspace_dir} as a directory, but it is not"
+        )
 
-    workspace_dir.mkdir(parents=True)
+    if workspace_dir.exists() and clean:
+        out(f"Clearing existing workspace {workspace_dir}")
+        shutil.rmtree(workspace_dir)
 
     ramble_workspace_dir = workspace_dir / "workspace"
     ramble_configs_dir = ramble_workspace_dir / "configs"
@@ -176,29 +386,25 @@ def command(args):
         ramble_configs_dir / "auxiliary_software_files"
     )
 
-    print(f"Setting up configs for Ramble workspace {ramble_configs_dir}")
+    if workspace_dir.exists():
+        out(f"Updating configs for Ramble workspace {ramble_configs_dir}")
+    else:
+        out(f"Setting up configs for Ramble workspace {ramble_configs_dir}")
 
     modifier_config_dir = source_dir / "modifiers" / modifier / "configs"
-    ramble_configs_dir.mkdir(parents=True)
-    ramble_logs_dir.mkdir(parents=True)
-    ramble_spack_experiment_configs_dir.mkdir(parents=True)
-
-    def include_fn(fname):
-        # Only include .yaml files
-        # Always exclude files that start with "."
-        if fname.startswith("."):
-            return False
-        if fname.endswith(".yaml"):
-            return True
-        return False
-
-    symlink_tree(configs_src_dir, ramble_configs_dir, include_fn)
-    symlink_tree(experiment_src_dir, ramble_configs_dir, include_fn)
-    symlink_tree(modifier_config_dir, ramble_configs_dir, include_fn)
-    symlink_tree(
+    ramble_configs_dir.mkdir(parents=True, exist_ok=True)
+    ramble_logs_dir.mkdir(parents=True, exist_ok=True)
+    ramble_spack_experiment_configs_dir.mkdir(parents=True, exist_ok=True)
+
+    links = {}
+    tree_links(configs_src_dir, ramble_configs_dir, include_yaml, links)
+    tree_links(experiment_src_dir, ramble_configs_dir, include_yaml, links)
+    tree_links(modifier_config_dir, ramble_configs_dir, include_yaml, links)
+    tree_links(
         source_dir / "configs" / "common",
         ramble_spack_experiment_configs_dir,
-        include_fn,
+        include_yaml,
+        links,
     )
 
     template_name = "execute_experiment.tpl"
@@ -210,26 +416,62 @@ def command(args):
     for choice_template in experiment_template_options:
         if os.path.exists(choice_template):
             break
-    os.symlink(
-        choice_template,
-        ramble_configs_dir / "execute_experiment.tpl",
-    )
+    links[str(ramble_configs_dir / "execute_experiment.tpl")] = str(choice_template)
+
+    added, updated, removed = sync_links(links, [ramble_configs_dir])
+    if added or updated or removed:
+        out(
+            f"Configs: {len(added)} added, {len(updated)} updated, "
+            f"{len(removed)} removed"
+        )
+        for label, paths in [("+", added), ("~", updated), ("-", removed)]:
+            for path in paths:
+                debug_print(f"{label} {os.path.relpath(path, ramble_configs_dir)}")
+    else:
+        out("Configs are up to date")
+
+    return ramble_workspace_dir
 
+
+def setup_runtime(experiments_root):
+    """Install Ramble and Spack for an experiments_root, configure them the
+    first time, and write its setup.sh.
+
+    Returns:
+        the path to setup.sh
+    """
+    source_dir = benchpark.paths.benchpark_root
     initializer_script = experiments_root / "setup.sh"
 
     per_workspace_setup = RuntimeResources(experiments_root)
+    per_workspace_setup.install()
 
-    spack, first_time_spack = per_workspace_setup.spack_first_time_setup()
-    ramble, first_time_ramble = per_workspace_setup.ramble_first_time_setup()
+    _, first_time_spack = per_workspace_setup.spack_first_time_setup()
+    _, first_time_ramble = per_workspace_setup.ramble_first_time_setup()
 
     if first_time_spack:
-        spack("repo", "add", "--scope=site", f"{source_dir}/repo")
+        per_workspace_setup.update_site_config(
+            "spack",
+            {
+                "config": {
+                    "misc_cache": str(per_workspace_setup.spack_location / "misc-cache")
+                },
+                "repos": [f"{source_dir}/repo"],
+            },
+        )
 
     if first_time_ramble:
-        ramble(f"repo add --scope=site {source_dir}/repo")
-        ramble('config --scope=site add "config:disable_progress_bar:true"')
-        ramble(f"repo add -t modifiers --scope=site {source_dir}/modifiers")
-        ramble("config --scope=site add \"config:spack:global:args:'-d'\"")
+        per_workspace_setup.update_site_config(
+            "ramble",
+            {
+                "config": {
+                    "disable_progress_bar": True,
+                    "spack": {"global": {"args": "-d"}},
+                },
+                "repos": [f"{source_dir}/repo"],
+                "modifier_repos": [f"{source_dir}/modifiers"],
+            },
+        )
 
     if not initializer_script.exists():
         with open(initializer_script, "w") as f:
@@ -248,6 +490,108 @@ export _BENCHPARK_INITIALIZED=true
 """
             )
 
+    return initializer_script
+
+
+def _setup_timed(experiments_root, target, clean):
+    """Set up one target of a campaign, without printing anything.
+
+    Returns:
+        ``(workspace dir or None, error or None, messages, seconds)``
+    """
+    messages = []
+    start = time.perf_counter()
+    try:
+        workspace = setup_workspace(experiments_root, target, clean, messages.append)
+        error = None
+    except Exception as e:
+        workspace = None
+        error = e
+    return workspace, error, messages, time.perf_counter() - start
+
+
+def setup_campaign(experiments_root, targets, clean=False, jobs=None):
+    """Set up many targets at once, sharing one Ramble/Spack runtime, and
+    print a summary.
+
+    Returns:
+        the number of targets that failed
+    """
+    print(f"Setting up {len(targets)} workspaces under {experiments_root}")
+    start = time.perf_counter()
+    initializer_script = setup_runtime(experiments_root)
+    print(f"Ramble and Spack are ready ({time.perf_counter() - start:.2f}s)")
+
+    # Targets for the same experiment and system share a workspace, so only
+    # the first of them is set up
+    first = {}
+    for target in targets:
+        first.setdefault((target.experiment, target.system), target)
+
+    def setup(target):
+        other = first[(target.experiment, target.system)]
+        if other is not target:
+            error = ValueError(f"uses the same workspace as {other}")
+            return None, error, [], 0.0
+        return _setup_timed(experiments_root, target, clean)
+
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        results = list(executor.map(setup, targets))
+
+    rows = []
+    for target, (workspace, error, messages, seconds) in zip(targets, results):
+        if error:
+            status = f"FAILED: {error}"
+        else:
+            status = messages[-1] if messages else "ok"
+        rows.append((str(target), f"{seconds:.2f}s", status))
+        for message in messages:
+            debug_print(f"{target}: {message}")
+
+    widths = [max(len(row[i]) for row in rows) for i in range(2)]
+    for name, seconds, status in rows:
+        print(f"  {name:<{widths[0]}}  {seconds:>{widths[1]}}  {status}")
+
+    failed = sum(1 for _, error, _, _ in results if error)
+    total = time.perf_counter() - start
+    print(f"{len(targets) - failed} succeeded, {failed} failed in {total:.2f}s")
+    print(f"To use these workspaces, first run: . {initializer_script}")
+    return failed
+
+
+def command(args):
+    positional = args.targets
+    experiments_root = None
+    targets = []
+    if args.campaign:
+        experiments_root, targets = load_campaign(args.campaign)
+        if len(positional) == 1:
+            experiments_root = positional.pop()
+    if positional:
+        if len(positional) < 3 or len(positional) % 2 == 0:
+            raise ValueError(
+                "Expected EXPERIMENT SYSTEM [EXPERIMENT SYSTEM ...] EXPERIMENTS_ROOT"
+            )
+        experiments_root = positional[-1]
+        pairs = positional[:-1]
+        targets.extend(
+            Target(e, s, args.modifier) for e, s in zip(pairs[::2], pairs[1::2])
+        )
+    if not experiments_root:
+        raise ValueError("No experiments_root given")
+    if not targets:
+        raise ValueError("No experiments to set up")
+
+    experiments_root = pathlib.Path(os.path.abspath(experiments_root))
+
+    if len(targets) > 1:
+        if setup_campaign(experiments_root, targets, args.clean, args.jobs):
+            sys.exit(1)
+        return
+
+    ramble_workspace_dir = setup_workspace(experiments_root, targets[0], args.clean)
+    initializer_script = setup_runtime(experiments_root)
+
     instructions = f"""\
 To complete the benchpark setup, do the following:
 
@@ -0,0 +1,179 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Submit the experiments of a workspace that uses the allocation modifier
+in packed or array mode, instead of one job per experiment:
+
+* packed: experiments are packed into a few allocations, each running a
+  driver script that launches the experiments concurrently and back-to-back
+* array: experiments that request the same resources are submitted as one
+  job array, with a file mapping each array index to an experiment
+"""
+
+import pathlib
+import shlex
+import shutil
+
+import benchpark.allocation
+import benchpark.runtime
+
+#: Where driver scripts are written, under the workspace
+PACKED_DIR = "packed"
+ARRAY_DIR = "array"
+
+
+def experiment_scripts(workspace_dir):
+    """The script of every experiment in a Ramble workspace."""
+    return sorted(
+        pathlib.Path(workspace_dir).glob("experiments/*/*/*/execute_experiment")
+    )
+
+
+def read_experiments(workspace_dir):
+    """The mode that the experiments in the workspace were set up with, and
+    (submit header, script path, script) for each of them.
+    """
+    modifier = benchpark.allocation.modifier()
+    experiments = []
+    for path in experiment_scripts(workspace_dir):
+        script = path.read_text()
+        header = modifier.parse_submit_header(script)
+        if header is None:
+            raise ValueError(
+                f"{path} was not set up with the allocation modifier in "
+                f"{' or '.join(modifier.GROUPED_MODES)} mode"
+            )
+        experiments.append((header, str(path), script))
+    if not experiments:
+        raise ValueError(f"No experiments found in {workspace_dir}")
+
+    modes = set(header["mode"] for header, _, _ in experiments)
+    if len(modes) > 1:
+        raise ValueError(f"Experiments in {workspace_dir} use different modes: {modes}")
+    return modes.pop(), experiments
+
+
+def prepare_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir()
+
+
+def submit_all(jobs, dry_run):
+    """Submit each (script, submit command) unless this is a dry run."""
+    if dry_run:
+        return
+    for script, submit in jobs:
+        stdout, _ = benchpark.runtime.run_command(
+            f"{submit} {shlex.quote(str(script))}"
+        )
+        print(stdout, end="")
+
+
+def packing_limits(args, v):
+    """The most nodes and minutes an allocation can have: the system's
+    max_request and timeout, or the --nodes and --time given if lower.
+    """
+    max_request = v.max_request or 1000
+    timeout = v.timeout or 120
+    return (
+        min(args.nodes or max_request, max_request),
+        min(args.time or timeout, timeout),
+    )
+
+
+def submit_packed(args, workspace_dir, v, experiments):
+    modifier = benchpark.allocation.modifier()
+    max_nodes, max_timeout = packing_limits(args, v)
+    allocations = modifier.pack_experiments(
+        [
+            (header["n_nodes"], header["timeout"], path)
+            for header, path, _ in experiments
+        ],
+        max_nodes,
+        max_timeout,
+    )
+
+    driver_dir = workspace_dir / PACKED_DIR
+    prepare_dir(driver_dir)
+    jobs = []
+    for i, allocation in enumerate(allocations):
+        script, submit = modifier.packed_driver_script(v, allocation)
+        driver = driver_dir / f"allocation_{i}.sh"
+        driver.write_text(script)
+        driver.chmod(0o755)
+        jobs.append((driver, submit))
+        print(
+            f"{driver}: {sum(len(x) for x in allocation.shelves)} experiment(s), "
+            f"{allocation.n_nodes} node(s), {allocation.timeout} minutes"
+        )
+
+    print(
+        f"Packed {len(experiments)} experiment(s) into {len(allocations)} "
+        f"allocation(s) of at most {max_nodes} node(s) and {max_timeout} minutes"
+    )
+    submit_all(jobs, args.dry_run)
+
+
+def submit_array(args, workspace_dir, v, experiments):
+    modifier = benchpark.allocation.modifier()
+    groups = modifier.array_groups(
+        (modifier.batch_directives(v.scheduler, script), path)
+        for _, path, script in experiments
+    )
+
+    array_dir = workspace_dir / ARRAY_DIR
+    prepare_dir(array_dir)
+    jobs = []
+    for i, (directives, paths) in enumerate(groups):
+        mapping_file = array_dir / f"array_{i}.txt"
+        mapping_file.write_text("".join(f"{j}\t{x}\n" for j, x in enumerate(paths)))
+        script, submit = modifier.array_driver_script(
+            v.scheduler, directives, mapping_file, len(paths)
+        )
+        driver = array_dir / f"array_{i}.sh"
+        driver.write_text(script)
+        driver.chmod(0o755)
+        jobs.append((driver, submit))
+        print(f"{driver}: {len(paths)} experiment(s), listed in {mapping_file}")
+
+    print(f"Grouped {len(experiments)} experiment(s) into {len(groups)} job array(s)")
+    submit_all(jobs, args.dry_run)
+
+
+def setup_parser(root_parser):
+    root_parser.add_argument(
+        "workspace_dir",
+        help="A workspace set up by `benchpark setup` "
+        "(experiments_root/<experiment>/<system>/workspace)",
+    )
+    root_parser.add_argument(
+        "--nodes",
+        type=int,
+        default=None,
+        help="In packed mode, the most nodes an allocation can have (default: "
+        "the system's max_request)",
+    )
+    root_parser.add_argument(
+        "--time",
+        type=int,
+        default=None,
+        help="In packed mode, the longest an allocation can run, in minutes "
+        "(default: the system's timeout)",
+    )
+    root_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Write the scripts to submit, but don't submit them",
+    )
+
+
+def command(args):
+    workspace_dir = pathlib.Path(args.workspace_dir).resolve()
+    v = benchpark.allocation.system_variables(workspace_dir / "configs")
+    mode, experiments = read_experiments(workspace_dir)
+    if mode == "packed":
+        submit_packed(args, workspace_dir, v, experiments)
+    else:
+        submit_array(args, workspace_dir, v, experiments)
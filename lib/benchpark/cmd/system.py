@@ -5,16 +5,34 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import concurrent.futures
 import os
 import shutil
 import sys
 
+import yaml
+
+import benchpark.allocation
+import benchpark.index
 import benchpark.system
 import benchpark.spec
 
+#: Lists the systems generated under a --basedir
+INDEX_FILE = "index.yaml"
+
 
 def system_init(args):
-    system_spec = benchpark.spec.SystemSpec(" ".join(args.spec))
+    spec_str = " ".join(args.spec)
+    if args.all:
+        if len(args.spec) != 1:
+            raise ValueError("--all takes the name of a system, without variants")
+        spec_str = benchpark.spec.combinations_pattern(
+            spec_str, benchpark.spec.SystemSpec
+        )
+    if benchpark.spec.is_pattern(spec_str):
+        return system_init_many(args, spec_str)
+
+    system_spec = benchpark.spec.SystemSpec(spec_str)
     system_spec = system_spec.concretize()
 
     system = system_spec.system
@@ -40,9 +58,142 @@ def system_init(args):
         shutil.rmtree(destdir)
         raise
 
+    if args.basedir:
+        update_index(args.basedir, {sysdir: system_spec})
+
+
+def _generate_description(system_spec, destdir):
+    """Generate one system description. This runs in a worker process."""
+    try:
+        os.mkdir(destdir)
+        system_spec.system.generate_description(destdir)
+    except Exception as e:
+        shutil.rmtree(destdir, ignore_errors=True)
+        return e
+    return None
+
+
+def system_init_many(args, pattern):
+    """Generate a system dir under --basedir for every valid spec that the
+    pattern expands to, skipping the ones that are already there.
+    """
+    if not args.basedir:
+        raise ValueError("Generating more than one system requires --basedir")
+    os.makedirs(args.basedir, exist_ok=True)
+
+    todo = {}
+    existing = {}
+    invalid = []
+    for spec_str, system_spec in benchpark.spec.concretize_expansion(
+        pattern, benchpark.spec.SystemSpec
+    ):
+        if isinstance(system_spec, Exception):
+            invalid.append((spec_str, system_spec))
+            continue
+        sysdir = system_spec.system.system_uid()
+        if os.path.exists(os.path.join(args.basedir, sysdir)):
+            existing[sysdir] = system_spec
+        else:
+            todo[sysdir] = system_spec
+
+    with concurrent.futures.ProcessPoolExecutor(args.jobs) as executor:
+        futures = {
+            sysdir: executor.submit(
+                _generate_description, system_spec, os.path.join(args.basedir, sysdir)
+            )
+            for sysdir, system_spec in todo.items()
+        }
+        errors = {sysdir: future.result() for sysdir, future in futures.items()}
+
+    generated = {}
+    for sysdir, system_spec in todo.items():
+        if errors[sysdir]:
+            print(f"Failed to generate {system_spec}: {errors[sysdir]}")
+        else:
+            print(f"{system_spec}: {os.path.join(args.basedir, sysdir)}")
+            generated[sysdir] = system_spec
+
+    update_index(args.basedir, {**existing, **generated})
+
+    print(f"Generated {len(generated)} system(s) under {args.basedir}")
+    if existing:
+        print(f"{len(existing)} system(s) were already there")
+    if invalid:
+        print(f"Skipped {len(invalid)} invalid combination(s):")
+        for spec_str, e in invalid:
+            print(f"    {spec_str}: {e}")
+    if len(generated) < len(todo):
+        sys.exit(1)
+
+
+def read_index(basedir):
+    try:
+        with open(os.path.join(basedir, INDEX_FILE), "r") as f:
+            return (yaml.safe_load(f) or {}).get("systems", {})
+    except FileNotFoundError:
+        return {}
+
+
+def update_index(basedir, system_specs):
+    """Record the spec of each system dir (by name) in the index of basedir."""
+    systems = read_index(basedir)
+    for sysdir, system_spec in system_specs.items():
+        systems[sysdir] = {"name": system_spec.name, "spec": str(system_spec)}
+
+    tmp = os.path.join(basedir, f".{INDEX_FILE}.tmp")
+    with open(tmp, "w") as f:
+        yaml.safe_dump({"systems": systems}, f, default_flow_style=False)
+    os.replace(tmp, os.path.join(basedir, INDEX_FILE))
+
 
 def system_list(args):
-    raise NotImplementedError("'benchpark system list' is not available")
+    if not args.basedir:
+        print("    ".join(benchpark.index.systems().names()))
+        return
+
+    systems = read_index(args.basedir)
+    for sysdir, info in sorted(systems.items(), key=lambda x: x[1]["spec"]):
+        path = os.path.join(args.basedir, sysdir)
+        missing = "" if os.path.isdir(path) else " (missing)"
+        print(f"{info['spec']}\t{path}{missing}")
+
+
+def parse_sweep_variable(arg):
+    """Parse ``name=value1,value2,...`` into a name and a list of ints."""
+    name, sep, values = arg.partition("=")
+    try:
+        if not sep:
+            raise ValueError()
+        return name, [int(x) for x in values.split(",")]
+    except ValueError:
+        raise ValueError(f"Expected name=value1,value2,... with integer values: {arg}")
+
+
+def system_preflight(args):
+    requests = benchpark.allocation.sweep(
+        dict(parse_sweep_variable(x) for x in args.variables)
+    )
+    solved, errors = benchpark.allocation.solve(args.system, requests)
+
+    total = len(solved["n_nodes"])
+    nodes = [int(x) for i, x in enumerate(solved["n_nodes"]) if i not in errors]
+    print(
+        f"{total} experiment(s) on {args.system}: {len(nodes)} can be allocated, "
+        f"{len(errors)} cannot"
+    )
+    if nodes:
+        print(
+            f"Nodes per experiment: {min(nodes)} to {max(nodes)}, "
+            f"{sum(nodes)} in total"
+        )
+    if errors:
+        print("Cannot be allocated:")
+        for i in sorted(errors)[: args.show]:
+            values = " ".join(f"{name}={requests[name][i]}" for name in requests)
+            print(f"    {values}: {errors[i]}")
+        if len(errors) > args.show:
+            print(f"    ... and {len(errors) - args.show} more")
+        sys.exit(1)
 
 
 def setup_parser(root_parser):
@@ -53,16 +204,64 @@ def setup_parser(root_parser):
     init_parser.add_argument(
         "--basedir", help="Generate a system dir under this, and place all files there"
     )
+    init_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Generate every combination of the system's variants (requires "
+        "--basedir)",
+    )
+    init_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="How many systems to generate at once",
+    )
 
-    init_parser.add_argument("spec", nargs="+", help="System spec")
+    init_parser.add_argument(
+        "spec",
+        nargs="+",
+        help="System spec. Use {a,b,...} for alternatives (e.g. "
+        "compiler={gcc,intel}) to generate every combination; this requires "
+        "--basedir",
+    )
 
-    system_subparser.add_parser("list")
+    list_parser = system_subparser.add_parser("list")
+    list_parser.add_argument(
+        "--basedir",
+        help="List the systems generated under this dir, instead of the "
+        "systems that are available",
+    )
+
+    preflight_parser = system_subparser.add_parser(
+        "preflight",
+        help="Check which combinations of resource requests can be allocated "
+        "on a system, and how many nodes they need",
+    )
+    preflight_parser.add_argument(
+        "--show",
+        type=int,
+        default=10,
+        help="How many experiments that cannot be allocated to list (default 10)",
+    )
+    preflight_parser.add_argument(
+        "system",
+        help="A system ID from `benchpark systems`, or a directory generated "
+        "by `benchpark system init`",
+    )
+    preflight_parser.add_argument(
+        "variables",
+        nargs="+",
+        help="Allocation variables to sweep, as name=value1,value2,... (e.g. "
+        "n_ranks=1,2,4 n_threads_per_proc=1,2). Every combination is checked.",
+    )
 
 
 def command(args):
     actions = {
         "init": system_init,
         "list": system_list,
+        "preflight": system_preflight,
     }
     if args.system_subcommand in actions:
         actions[args.system_subcommand](args)
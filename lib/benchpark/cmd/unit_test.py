@@ -10,11 +10,18 @@ import os
 import re
 import sys
 
-import llnl.util.filesystem
-import llnl.util.tty.color as color
-import llnl.util.tty.colify as colify
-
 import benchpark.paths
+import benchpark.runtime
+
+# isort: off
+
+benchpark.runtime.bootstrap()  # noqa
+
+import llnl.util.filesystem  # noqa
+import llnl.util.tty.color as color  # noqa
+import llnl.util.tty.colify as colify  # noqa
+
+# isort: on
 
 
 def setup_parser(subparser):
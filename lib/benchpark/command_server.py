@@ -0,0 +1,117 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Run Ramble or Spack commands in a long-lived process.
+
+Importing Ramble/Spack takes most of the time of a short command like
+``ramble repo add``, so ``benchpark.runtime.Command`` starts this script
+once per tool and sends it commands instead of running ``bin/<tool>``
+for each one::
+
+    python command_server.py <tool> <prefix> <response_fd>
+
+Each line read from stdin is a JSON request ``{"args": [...], "cwd": ...}``.
+For each one, a JSON response ``{"returncode": ..., "stdout": ...,
+"stderr": ...}`` is written on ``response_fd``. Each command runs in a
+forked child with file descriptors 1 and 2 redirected, so it does not see
+state left by earlier commands, and output from the tool and any processes
+it starts is captured just like it would be for a subprocess.
+
+This script must not import anything from Benchpark: it runs with the
+environment that would be used for the tool.
+"""
+
+import importlib
+import json
+import os
+import sys
+import tempfile
+import traceback
+
+
+def _setup_path(tool, prefix):
+    """Make the tool importable, like ``bin/<tool>`` does."""
+    lib_path = os.path.join(prefix, "lib", tool)
+    for path in [
+        os.path.join(lib_path, "external", "_vendoring"),
+        os.path.join(lib_path, "external"),
+        lib_path,
+    ]:
+        if os.path.isdir(path) and path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def _exit_code(exit_exc):
+    code = exit_exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _exit_status(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _run(main, args):
+    """Run ``main(args)`` in a forked child, so that each command starts
+    from the state the tool is in right after it is imported: any config
+    scopes, repos or caches that a command loads are gone when it ends,
+    like they would be for a subprocess.
+    """
+    with tempfile.TemporaryFile(mode="w+") as out, tempfile.TemporaryFile(
+        mode="w+"
+    ) as err:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            returncode = 1
+            try:
+                os.dup2(out.fileno(), 1)
+                os.dup2(err.fileno(), 2)
+                returncode = main(args) or 0
+            except SystemExit as e:
+                returncode = _exit_code(e)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(returncode)
+
+        _, status = os.waitpid(pid, 0)
+        out.seek(0)
+        err.seek(0)
+        return _exit_status(status), out.read(), err.read()
+
+
+def serve(tool, prefix, response_fd):
+    _setup_path(tool, prefix)
+    main = importlib.import_module(f"{tool}.main").main
+
+    with os.fdopen(response_fd, "w") as responses:
+        for line in sys.stdin:
+            request = json.loads(line)
+            os.chdir(request["cwd"])
+            returncode, stdout, stderr = _run(main, request["args"])
+            response = {"returncode": returncode, "stdout": stdout, "stderr": stderr}
+            responses.write(json.dumps(response) + "\n")
+            responses.flush()
+
+
+if __name__ == "__main__":
+    # Running this as a script puts lib/benchpark first in sys.path, where
+    # the module names could shadow modules that the tool imports
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(
+        os.path.abspath(__file__)
+    ):
+        del sys.path[0]
+
+    serve(sys.argv[1], sys.argv[2], int(sys.argv[3]))
@@ -3,18 +3,23 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
 from typing import Dict
 import yaml  # TODO: some way to ensure yaml available
 
 from benchpark.directives import ExperimentSystemBase
+import benchpark.index
 import benchpark.spec
 import benchpark.paths
 import benchpark.repo
 import benchpark.runtime
 import benchpark.variant
 
-bootstrapper = benchpark.runtime.RuntimeResources(benchpark.paths.benchpark_home)
-bootstrapper.bootstrap()
+benchpark.runtime.bootstrap()
 
 import ramble.language.language_base  # noqa
 import ramble.language.language_helpers  # noqa
@@ -95,4 +100,90 @@ class Experiment(ExperimentSystemBase):
     def write_ramble_dict(self, filepath):
         ramble_dict = self.compute_ramble_dict()
         with open(filepath, "w") as f:
-            yaml.dump(ramble_dict, f)
+            yaml.dump(ramble_dict, f, Dumper=YamlDumper)
+
+
+#: libyaml's emitter is much faster, when PyYAML was built with it
+YamlDumper = getattr(yaml, "CDumper", yaml.Dumper)
+
+
+#: How many rendered ramble.yaml files to keep in the experiment cache
+EXPERIMENT_CACHE_MAX = 2048
+
+#: Cached files are touched at most this often (seconds) when they are used,
+#: and files used more recently than this are never evicted
+_EXPERIMENT_CACHE_TOUCH_INTERVAL = 3600
+
+
+def ramble_dict_key(spec: "benchpark.spec.ConcreteExperimentSpec") -> str:
+    """Key for the ramble.yaml of an experiment: it changes when the spec,
+    the experiment's source, or the Benchpark library does.
+    """
+    sha = hashlib.sha256()
+    sha.update(benchpark.__version__.encode())
+    sha.update(benchpark.index.library_hash().encode())
+    sha.update(str(spec).encode())
+    sha.update(benchpark.index.source_hash(spec.experiment_class).encode())
+    return sha.hexdigest()
+
+
+def cached_ramble_dict(
+    spec: "benchpark.spec.ConcreteExperimentSpec",
+    cache_dir=benchpark.paths.experiment_cache_path,
+) -> pathlib.Path:
+    """Path to the rendered ramble.yaml for ``spec`` in the cache, rendering
+    it first if nothing it depends on was rendered before. The least
+    recently used files are removed when there are too many.
+    """
+    cache_dir = pathlib.Path(cache_dir)
+    cached = cache_dir / f"{ramble_dict_key(spec)}.yaml"
+    try:
+        benchpark.paths.touch_stored(cached, _EXPERIMENT_CACHE_TOUCH_INTERVAL)
+        return cached
+    except FileNotFoundError:
+        pass
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        spec.experiment.write_ramble_dict(tmp)
+        os.replace(tmp, cached)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    benchpark.paths.evict_stored(
+        cache_dir,
+        "*.yaml",
+        EXPERIMENT_CACHE_MAX,
+        _EXPERIMENT_CACHE_TOUCH_INTERVAL,
+    )
+    return cached
+
+
+def write_cached_ramble_dict(
+    spec: "benchpark.spec.ConcreteExperimentSpec",
+    filepath,
+    cache_dir=benchpark.paths.experiment_cache_path,
+):
+    """Write the ramble.yaml for ``spec`` to ``filepath``, reusing the one
+    rendered last time if nothing it depends on has changed.
+    """
+    shutil.copyfile(cached_ramble_dict(spec, cache_dir), filepath)
+
+
+def content_hash(
+    spec: "benchpark.spec.ConcreteExperimentSpec",
+    cache_dir=benchpark.paths.experiment_cache_path,
+) -> str:
+    """Hash identifying an experiment by its content: the concrete spec, the
+    source of its class, and the ramble.yaml generated for it. Unlike
+    ``hash(spec)`` it is the same in every process and on every machine.
+    """
+    sha = hashlib.sha256()
+    sha.update(str(spec).encode())
+    sha.update(benchpark.index.source_hash(spec.experiment_class).encode())
+    with open(cached_ramble_dict(spec, cache_dir), "rb") as f:
+        sha.update(hashlib.sha256(f.read()).hexdigest().encode())
+    return sha.hexdigest()
@@ -0,0 +1,266 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""An on-disk index of the experiments and systems in Benchpark's repos.
+
+Listing and auditing only need names, variants and which methods a class
+defines, but getting those from ``benchpark.repo`` means importing Ramble
+and every ``experiment.py``/``system.py``. The index records them per
+object, together with the size, mtime and hash of each source file the
+class was built from, under ``benchpark_home`` (in a file per repo
+directory, so that separate Benchpark checkouts have separate indexes).
+Only objects whose files changed are imported again to refresh their entry.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import tempfile
+
+import benchpark.paths
+
+#: Bump this when the format of entries changes
+INDEX_VERSION = 1
+
+
+def _file_stamp(path, sha256=None):
+    stat = os.stat(path)
+    if sha256 is None:
+        with open(path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+    return [stat.st_mtime_ns, stat.st_size, sha256]
+
+
+def _is_current(stamps):
+    for path, (mtime_ns, size, sha256) in stamps.items():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+            continue
+        # Touched but maybe not changed (e.g. by git checkout)
+        if _file_stamp(path)[2] != sha256:
+            return False
+        stamps[path] = _file_stamp(path, sha256)
+    return True
+
+
+def _source_files(cls):
+    """Files within Benchpark that define ``cls`` or a class it inherits from."""
+    files = set()
+    for c in inspect.getmro(cls):
+        try:
+            path = pathlib.Path(inspect.getsourcefile(c)).resolve()
+        except TypeError:
+            continue
+        if benchpark.paths.benchpark_root in path.parents:
+            files.add(str(path))
+    return sorted(files)
+
+
+@functools.lru_cache(maxsize=None)
+def source_hash(cls):
+    """Hash of the Benchpark source files that define ``cls``, including the
+    classes it inherits from.
+    """
+    sha = hashlib.sha256()
+    for path in _source_files(cls):
+        sha.update(os.path.relpath(path, benchpark.paths.benchpark_root).encode())
+        sha.update(_file_stamp(path)[2].encode())
+    return sha.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def library_hash():
+    """Hash of the Benchpark library (``lib/benchpark``, without its tests),
+    which can affect the output of any experiment or system class.
+    """
+    sha = hashlib.sha256()
+    for path in sorted(benchpark.paths.lib_path.rglob("*.py")):
+        if benchpark.paths.test_path in path.parents:
+            continue
+        sha.update(os.path.relpath(path, benchpark.paths.lib_path).encode())
+        sha.update(_file_stamp(path)[2].encode())
+    return sha.hexdigest()
+
+
+def _json_value(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def describe_class(cls):
+    """Everything the index records about an experiment or system class."""
+    variants = []
+    for when, variants_by_name in getattr(cls, "variants", {}).items():
+        for name, variant in variants_by_name.items():
+            variants.append(
+                {
+                    "name": name,
+                    "when": str(when),
+                    "default": _json_value(variant.default),
+                    "description": variant.description,
+                    "values": (
+                        None
+                        if variant.values is None
+                        else [_json_value(v) for v in variant.values]
+                    ),
+                    "multi": variant.multi,
+                }
+            )
+
+    return {
+        "class_name": cls.__name__,
+        "description": inspect.getdoc(cls) or "",
+        "methods": sorted(
+            name for name, value in vars(cls).items() if inspect.isfunction(value)
+        ),
+        "variants": variants,
+        "files": {path: _file_stamp(path) for path in _source_files(cls)},
+    }
+
+
+class RepoIndex:
+    """Index of one repo, e.g. all the experiments in ``var/exp_repo``.
+
+    Args:
+        repo_dir: directory holding one subdirectory per object
+        file_name: file defining the object in each subdirectory
+        cache_file: where the index is stored
+        load_class: function returning the class for an object name; it is
+            only called for objects whose entry is missing or stale
+    """
+
+    def __init__(self, repo_dir, file_name, cache_file, load_class):
+        self.repo_dir = pathlib.Path(repo_dir)
+        self.file_name = file_name
+        self.cache_file = pathlib.Path(cache_file)
+        self.load_class = load_class
+        self._entries = None
+        self._dirty = False
+
+    def names(self):
+        """Names of all objects in the repo. Nothing is imported for this."""
+        return sorted(
+            entry.name
+            for entry in os.scandir(self.repo_dir)
+            if entry.is_dir() and os.path.exists(os.path.join(entry, self.file_name))
+        )
+
+    def filename_for_object_name(self, name):
+        return self.repo_dir / name / self.file_name
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self._entries = data["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return self._entries
+
+    def entry(self, name):
+        """The index entry for one object, refreshed first if it is stale."""
+        entries = self._load()
+        entry = entries.get(name)
+        stamps = dict(entry["files"]) if entry else None
+        if entry is None or not _is_current(entry["files"]):
+            entry = describe_class(self.load_class(name))
+            path = str(self.filename_for_object_name(name).resolve())
+            entry["files"].setdefault(path, _file_stamp(path))
+            entries[name] = entry
+            self._dirty = True
+        elif entry["files"] != stamps:
+            # Only the mtimes changed
+            self._dirty = True
+        return entry
+
+    def entries(self):
+        """All index entries, by name. Stale entries are refreshed and the
+        index is written back to disk.
+        """
+        names = self.names()
+        result = {name: self.entry(name) for name in names}
+        for name in set(self._load()) - set(names):
+            del self._entries[name]
+            self._dirty = True
+        self.save()
+        return result
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_file.parent)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": INDEX_VERSION, "entries": self._entries}, f)
+            os.replace(tmp, self.cache_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._dirty = False
+
+
+def _repo_class_loader(object_type_name):
+    def load_class(name):
+        # Only import Ramble (via benchpark.repo) if something must be indexed
+        import benchpark.repo
+
+        object_type = benchpark.repo.ObjectTypes[object_type_name]
+        return benchpark.repo.paths[object_type].get_obj_class(name)
+
+    return load_class
+
+
+def cache_file(object_type_name, repo_dir):
+    """Where the index of ``repo_dir`` is stored."""
+    repo_hash = hashlib.sha256(str(pathlib.Path(repo_dir).resolve()).encode())
+    return (
+        benchpark.paths.index_path
+        / f"{object_type_name}-{repo_hash.hexdigest()[:16]}.json"
+    )
+
+
+_indexes = {}
+
+
+def _index(object_type_name, repo_dir, file_name):
+    if object_type_name not in _indexes:
+        _indexes[object_type_name] = RepoIndex(
+            repo_dir,
+            file_name,
+            cache_file(object_type_name, repo_dir),
+            _repo_class_loader(object_type_name),
+        )
+    return _indexes[object_type_name]
+
+
+def experiments():
+    """The index of ``var/exp_repo``."""
+    return _index(
+        "experiments",
+        benchpark.paths.benchpark_root / "var" / "exp_repo" / "experiments",
+        "experiment.py",
+    )
+
+
+def systems():
+    """The index of ``var/sys_repo``."""
+    return _index(
+        "systems",
+        benchpark.paths.benchpark_root / "var" / "sys_repo" / "systems",
+        "system.py",
+    )
@@ -5,6 +5,7 @@
 
 import os
 import pathlib
+import time
 
 
 def _source_location() -> pathlib.Path:
@@ -19,3 +20,41 @@ test_path = lib_path / "test"
 benchpark_home = pathlib.Path(os.path.expanduser("~/.benchpark"))
 global_ramble_path = benchpark_home / "ramble"
 global_spack_path = benchpark_home / "spack"
+runtimes_path = benchpark_home / "runtimes"
+index_path = benchpark_home / "index"
+experiment_cache_path = benchpark_home / "experiment-cache"
+adhoc_configs_path = benchpark_home / "adhoc-configs"
+
+
+def touch_stored(path, interval):
+    """Mark a file in one of the stores under ``benchpark_home`` as used, by
+    updating its mtime if it is older than ``interval`` seconds.
+
+    Raises:
+        FileNotFoundError: if the file is not stored
+    """
+    if time.time() - os.stat(path).st_mtime > interval:
+        os.utime(path)
+
+
+def evict_stored(store, pattern, keep, min_age):
+    """Remove the least recently used files matching ``pattern`` in
+    ``store`` until at most ``keep`` are left. Files used in the last
+    ``min_age`` seconds are kept regardless, since another process may be
+    about to read them.
+    """
+    entries = []
+    for path in pathlib.Path(store).glob(pattern):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            pass
+    entries.sort()
+    now = time.time()
+    for mtime, path in entries[: max(0, len(entries) - keep)]:
+        if now - mtime < min_age:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
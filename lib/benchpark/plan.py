@@ -0,0 +1,275 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Count the experiments a ramble.yaml would generate on a system, and the
+resources they would request, without setting up a workspace.
+
+Each experiment template is rendered like Ramble does it: vector variables
+named in a zip are zipped, each matrix is the cross product of the vectors
+it names (and matrices are zipped with each other), and the vectors left
+over are zipped and crossed with the result. Experiments matching an
+``exclude: where`` expression are dropped, and the remaining ones are sized
+with the allocation modifier's rules (see ``benchpark.allocation``).
+Other kinds of exclusion are not applied.
+"""
+
+import ast
+import itertools
+import operator
+import re
+
+import benchpark.allocation
+
+#: Default job time limit, in minutes, as in the allocation modifier
+DEFAULT_TIMEOUT = 120
+
+_VAR_REF = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Not: operator.not_,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _eval_node(node):
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body)
+    if isinstance(node, ast.Constant) and isinstance(
+        node.value, (int, float, str, bool)
+    ):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return _BINARY_OPS[type(node.op)](_eval_node(node.left), _eval_node(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval_node(node.operand))
+    if isinstance(node, ast.BoolOp):
+        values = (_eval_node(x) for x in node.values)
+        return all(values) if isinstance(node.op, ast.And) else any(values)
+    if isinstance(node, ast.Compare):
+        left = _eval_node(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARE_OPS:
+                break
+            right = _eval_node(comparator)
+            if not _COMPARE_OPS[type(op)](left, right):
+                return False
+            left = right
+        else:
+            return True
+    raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+
+
+def evaluate(expression):
+    """Evaluate an arithmetic, comparison or boolean expression of numbers
+    and strings. Nothing else (names, calls, attributes...) is allowed.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Cannot evaluate: {expression}")
+    return _eval_node(tree)
+
+
+def expand(value, variables, _depth=0):
+    """Replace each ``{name}`` in value with the expansion of that variable,
+    evaluating math along the way like Ramble does. References to undefined
+    variables are left as they are.
+    """
+    if _depth > 100:
+        raise ValueError(f"Variable definitions are circular: {value}")
+
+    def expand_ref(match):
+        name = match.group(1)
+        if name not in variables:
+            return match.group(0)
+        return expand(variables[name], variables, _depth + 1)
+
+    expanded = _VAR_REF.sub(expand_ref, str(value))
+    try:
+        result = evaluate(expanded)
+    except (ValueError, ArithmeticError, TypeError):
+        return expanded
+    if isinstance(result, bool) or not isinstance(result, (int, float)):
+        return expanded
+    if isinstance(result, float) and result.is_integer():
+        result = int(result)
+    return str(result)
+
+
+def _merge(parts):
+    merged = {}
+    for part in parts:
+        merged.update(part)
+    return merged
+
+
+def _zip_vectors(vectors, what):
+    lengths = set(len(x) for x in vectors.values())
+    if len(lengths) > 1:
+        raise ValueError(
+            f"{what} must have the same length: "
+            + ", ".join(f"{name} ({len(x)})" for name, x in vectors.items())
+        )
+    return [_merge(rows) for rows in zip(*vectors.values())]
+
+
+def render(experiment):
+    """The variables of each experiment generated by an experiment template
+    (one entry under ``experiments:`` in a ramble.yaml). Values are left
+    unexpanded.
+    """
+    scalars = {}
+    # Each vector is a list of the variables it sets in each experiment
+    vectors = {}
+    for name, value in (experiment.get("variables") or {}).items():
+        if isinstance(value, list):
+            vectors[name] = [{name: x} for x in value]
+        else:
+            scalars[name] = value
+
+    for zip_name, names in (experiment.get("zips") or {}).items():
+        missing = [x for x in names if x not in vectors]
+        if missing:
+            raise ValueError(f"Zip {zip_name} refers to non-vectors: {missing}")
+        vectors[zip_name] = _zip_vectors(
+            dict((x, vectors.pop(x)) for x in names), f"Variables in zip {zip_name}"
+        )
+
+    matrices = list(experiment.get("matrices") or [])
+    if experiment.get("matrix"):
+        matrices.append(experiment["matrix"])
+    matrix_rows = {}
+    for i, matrix in enumerate(matrices):
+        if isinstance(matrix, dict):
+            name, names = next(iter(matrix.items()))
+        else:
+            name, names = f"matrix {i}", matrix
+        if isinstance(names, str):
+            names = [names]
+        missing = [x for x in names if x not in vectors]
+        if missing:
+            raise ValueError(
+                f"Matrix {name} refers to missing or already used vectors: {missing}"
+            )
+        consumed = [vectors.pop(x) for x in names]
+        matrix_rows[name] = [_merge(rows) for rows in itertools.product(*consumed)]
+
+    if matrix_rows:
+        rows = _zip_vectors(matrix_rows, "Matrices")
+        if vectors:
+            leftover = _zip_vectors(vectors, "Vectors outside of matrices")
+            rows = [_merge(x) for x in itertools.product(rows, leftover)]
+    elif vectors:
+        rows = _zip_vectors(vectors, "Vectors outside of matrices")
+    else:
+        rows = [{}]
+
+    return [{**scalars, **row} for row in rows]
+
+
+def is_excluded(variables, where):
+    """Whether any of the ``exclude: where`` expressions is true."""
+    for expression in where:
+        if evaluate(expand(expression, variables)):
+            return True
+    return False
+
+
+class TemplatePlan:
+    """What one experiment template generates on a system."""
+
+    def __init__(self, name):
+        self.name = name
+        #: Variables of each experiment that is not excluded
+        self.experiments = []
+        self.excluded = 0
+        #: Index into experiments, and why it cannot be allocated
+        self.errors = {}
+        self.n_nodes = []
+        self.node_hours = 0.0
+
+
+def _templates(ramble_dict):
+    """(name, variables in scope, experiment template) for each experiment
+    template, with variables defined at each level of the ramble.yaml.
+    """
+    ramble = ramble_dict.get("ramble", ramble_dict)
+    top = ramble.get("variables") or {}
+    for app in (ramble.get("applications") or {}).values():
+        app_vars = {**top, **(app.get("variables") or {})}
+        for workload in (app.get("workloads") or {}).values():
+            workload_vars = {**app_vars, **(workload.get("variables") or {})}
+            for name, experiment in (workload.get("experiments") or {}).items():
+                yield name, workload_vars, experiment
+
+
+def plan(ramble_dict, system):
+    """A TemplatePlan for each experiment template in ``ramble_dict`` (the
+    contents of a ramble.yaml), on ``system``.
+    """
+    modifier = benchpark.allocation.modifier()
+    system_vars = benchpark.allocation.read_system_variables(system)
+
+    plans = []
+    for name, scope_vars, experiment in _templates(ramble_dict):
+        template = TemplatePlan(name)
+        where = (experiment.get("exclude") or {}).get("where") or []
+        for row in render(experiment):
+            variables = {**system_vars, **scope_vars, **row}
+            if is_excluded(variables, where):
+                template.excluded += 1
+            else:
+                template.experiments.append(variables)
+
+        requests = []
+        config_errors = {}
+        for i, variables in enumerate(template.experiments):
+            values = {}
+            for alloc_opt in modifier.AllocOpt:
+                var = alloc_opt.name.lower()
+                if var in variables:
+                    values[var] = expand(variables[var], variables)
+            try:
+                attrs = modifier.AttrDict.from_dict(values)
+            except RuntimeError as e:
+                config_errors[i] = str(e)
+                attrs = modifier.AttrDict()
+            requests.append(benchpark.allocation.integer_options(attrs))
+
+        if requests:
+            columns = dict(
+                (var, [x.get(var) for x in requests])
+                for var in sorted(set().union(*requests))
+            )
+            solved, errors = modifier.solve_allocations(columns)
+            template.errors = {**errors, **config_errors}
+            for i, n_nodes in enumerate(solved["n_nodes"]):
+                if i in template.errors:
+                    continue
+                timeout = int(solved["timeout"][i]) or DEFAULT_TIMEOUT
+                template.n_nodes.append(int(n_nodes))
+                template.node_hours += int(n_nodes) * timeout / 60
+        plans.append(template)
+    return plans
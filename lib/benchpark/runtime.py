@@ -3,12 +3,21 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import asyncio
+import atexit
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import json
 import os
 import pathlib
 import shlex
+import shutil
+import signal
 import subprocess
 import sys
+import tempfile
+import threading
 
 import yaml
 
@@ -16,6 +25,13 @@ import benchpark.paths
 
 DEBUG = False
 
+#: Run Ramble/Spack commands through a CommandServer when possible
+USE_COMMAND_SERVER = os.environ.get("BENCHPARK_COMMAND_SERVER", "1") != "0"
+
+#: How many of the last lines of output from each stream of a command are
+#: included in the error when the command fails
+ERROR_REPORT_LINES = 100
+
 
 def debug_print(message):
     if DEBUG:
@@ -32,28 +48,364 @@ def working_dir(location):
         os.chdir(initial_dir)
 
 
-def git_clone_commit(url, commit, destination):
-    run_command(f"git clone -c feature.manyFiles=true {url} {destination}")
+def _is_full_sha(commit):
+    return len(commit) == 40 and all(c in "0123456789abcdef" for c in commit)
+
+
+def resolve_commit(url, commit):
+    """The full hash of ``commit`` (which may be abbreviated) if it is the
+    tip of a branch or tag of ``url``, else None.
+    """
+    if _is_full_sha(commit):
+        return commit
+    stdout, _ = run_command(f"git ls-remote {url}")
+    matches = set(
+        line.split()[0] for line in stdout.splitlines() if line.startswith(commit)
+    )
+    return matches.pop() if len(matches) == 1 else None
+
+
+def git_clone_commit(url, commit, destination, reference=None, checkout=True):
+    """Create a repository at ``destination`` with ``commit`` checked out
+    (or, if ``checkout`` is False, with no files checked out).
+
+    If ``commit`` is a full hash, or an abbreviated hash of a branch or tag
+    tip, only that commit (and none of its history) is fetched from
+    ``url``. Otherwise the history of every branch is fetched without any
+    of its files, to find the commit.
+
+    If ``reference`` is an existing clone of the same project, objects it
+    already has are not downloaded again (like ``git clone --reference
+    --dissociate``): the new repository does not depend on ``reference``
+    once this returns.
+
+    The repository is created in a temporary directory next to
+    ``destination`` and moved into place once it is complete, so a failed
+    clone leaves nothing behind. This does not change the working
+    directory, so multiple clones can run concurrently in threads.
+    """
+    destination = pathlib.Path(destination).absolute()
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    staging = pathlib.Path(
+        tempfile.mkdtemp(dir=destination.parent, prefix=f".{destination.name}-")
+    )
+    try:
+        _clone_commit(url, commit, staging, reference, checkout)
+        os.rename(staging, destination)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _clone_commit(url, commit, destination, reference, checkout):
+    git = f"git -C {destination}"
+
+    run_command(f"git init --quiet {destination}")
+    run_command(f"{git} config feature.manyFiles true")
+
+    alternates = destination / ".git" / "objects" / "info" / "alternates"
+    reference_objects = reference and pathlib.Path(reference) / ".git" / "objects"
+    if reference_objects and reference_objects.is_dir():
+        with open(alternates, "w") as f:
+            f.write(f"{reference_objects.absolute()}\n")
+
+    run_command(f"{git} remote add origin {url}")
+    full_commit = resolve_commit(url, commit)
+    if full_commit:
+        run_command(f"{git} fetch --quiet --depth 1 origin {full_commit}")
+    else:
+        print(
+            f"{commit} is not a full commit hash, so the history of {url} is "
+            "fetched to find it (pin the full hash to fetch only that commit)"
+        )
+        run_command(f"{git} fetch --quiet --filter=tree:0 origin")
+        stdout, _ = run_command(f"{git} rev-parse --verify --quiet {commit}^{{commit}}")
+        full_commit = stdout.strip()
+    if checkout:
+        run_command(f"{git} checkout --quiet --detach {full_commit}")
+
+    if alternates.exists():
+        # Copy what we used from the reference so it can be removed
+        run_command(f"{git} repack -a -d -q")
+        alternates.unlink()
+
+
+def _head_commit(repo):
+    """The commit checked out in ``repo``, or "" if it is not a clone."""
+    if not (pathlib.Path(repo) / ".git").exists():
+        return ""
+    try:
+        stdout, _ = run_command(f"git -C {repo} rev-parse HEAD")
+    except RuntimeError:
+        return ""
+    return stdout.strip()
+
+
+class _CommandOutput:
+    """Collects the output of one stream (stdout or stderr) of a command.
+
+    The last ``ERROR_REPORT_LINES`` lines are always kept for error
+    reports; all of the output is only kept if ``capture`` is True.
+    """
+
+    def __init__(self, name, capture, on_output):
+        self.name = name
+        self.lines = [] if capture else None
+        self.tail = collections.deque(maxlen=ERROR_REPORT_LINES)
+        self.on_output = on_output
+
+    def add(self, line):
+        if self.lines is not None:
+            self.lines.append(line)
+        self.tail.append(line)
+        if self.on_output:
+            self.on_output(self.name, line)
 
-    with working_dir(destination):
-        run_command(f"git checkout {commit}")
+    def text(self):
+        return "".join(self.lines) if self.lines is not None else None
 
 
-def run_command(command_str, env=None):
+def _command_error(command_str, stdout, stderr, reason):
+    return RuntimeError(
+        f"Failed command ({reason}): {command_str}\n"
+        f"Output: {''.join(stdout.tail)}\nError: {''.join(stderr.tail)}"
+    )
+
+
+def _kill_process_group(proc):
+    # Commands are started in their own session so that anything they
+    # started (which may be holding their output open) is killed too
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_command(command_str, env=None, timeout=None, on_output=None, capture=True):
+    """Run a command, reading its output as it is written.
+
+    Args:
+        command_str: the command to run (split with ``shlex``)
+        env: environment for the command (by default, inherit ours)
+        timeout: seconds to wait for the command before killing it
+        on_output: if given, called as ``on_output(stream, line)`` with
+            ``stream`` being "stdout" or "stderr", for each line of output
+            as soon as it is read (from a separate thread per stream)
+        capture: if False, don't keep the output in memory (only the
+            last lines, for error reports); stdout/stderr are returned as
+            None
+
+    Returns:
+        (stdout, stderr)
+
+    Raises:
+        RuntimeError: if the command fails or times out
+    """
     proc = subprocess.Popen(
         shlex.split(command_str),
         env=env,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
+        start_new_session=True,
     )
-    stdout, stderr = proc.communicate()
+    stdout = _CommandOutput("stdout", capture, on_output)
+    stderr = _CommandOutput("stderr", capture, on_output)
+
+    def read_lines(stream, output):
+        with stream:
+            for line in stream:
+                output.add(line)
+
+    readers = [
+        threading.Thread(target=read_lines, args=(proc.stdout, stdout), daemon=True),
+        threading.Thread(target=read_lines, args=(proc.stderr, stderr), daemon=True),
+    ]
+    try:
+        for reader in readers:
+            reader.start()
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_process_group(proc)
+        proc.wait()
+        for reader in readers:
+            reader.join()
+        raise _command_error(command_str, stdout, stderr, f"timed out after {timeout}s")
+    except BaseException:
+        # e.g. KeyboardInterrupt: don't leave the command running
+        _kill_process_group(proc)
+        proc.wait()
+        for reader in readers:
+            if reader.ident is not None:
+                reader.join()
+        proc.stdout.close()
+        proc.stderr.close()
+        raise
+
+    for reader in readers:
+        reader.join()
+
     if proc.returncode != 0:
-        raise RuntimeError(
-            f"Failed command: {command_str}\nOutput: {stdout}\nError: {stderr}"
+        raise _command_error(command_str, stdout, stderr, f"exit {proc.returncode}")
+
+    return (stdout.text(), stderr.text())
+
+
+async def run_command_async(
+    command_str, env=None, timeout=None, on_output=None, capture=True
+):
+    """Like ``run_command``, but as a coroutine so that several commands can
+    run at once in an event loop (see ``run_commands``). ``on_output`` is
+    called from the event loop.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *shlex.split(command_str),
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+        # The default (64KiB) is too small for some single lines of output
+        limit=2**24,
+    )
+    stdout = _CommandOutput("stdout", capture, on_output)
+    stderr = _CommandOutput("stderr", capture, on_output)
+
+    async def read_lines(stream, output):
+        async for line in stream:
+            output.add(line.decode(errors="replace"))
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                read_lines(proc.stdout, stdout),
+                read_lines(proc.stderr, stderr),
+                proc.wait(),
+            ),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        _kill_process_group(proc)
+        await proc.wait()
+        raise _command_error(command_str, stdout, stderr, f"timed out after {timeout}s")
+    except BaseException:
+        # e.g. cancellation, or an error from on_output
+        _kill_process_group(proc)
+        await proc.wait()
+        raise
+
+    if proc.returncode != 0:
+        raise _command_error(command_str, stdout, stderr, f"exit {proc.returncode}")
+
+    return (stdout.text(), stderr.text())
+
+
+def run_commands(*command_strs, **kwargs):
+    """Run independent commands concurrently, and return their
+    ``(stdout, stderr)`` in the same order. ``kwargs`` are passed to
+    ``run_command_async`` for each command. The first failure is raised
+    once all of the commands have finished.
+    """
+
+    async def run_all():
+        return await asyncio.gather(
+            *(run_command_async(x, **kwargs) for x in command_strs),
+            return_exceptions=True,
         )
 
-    return (stdout, stderr)
+    results = asyncio.run(run_all())
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+class CommandServerError(Exception):
+    pass
+
+
+class CommandServer:
+    """A Python process that imports Ramble or Spack once, and then runs
+    any number of commands for it (see ``benchpark/command_server.py``).
+
+    This avoids paying for the tool's startup time on every command.
+    """
+
+    def __init__(self, tool, prefix, env):
+        self.tool = tool
+        self.prefix = prefix
+        self.env = env
+        self.proc = None
+        self.responses = None
+
+    def start(self):
+        server_script = benchpark.paths.lib_path / "command_server.py"
+        read_fd, write_fd = os.pipe()
+        try:
+            self.proc = subprocess.Popen(
+                [
+                    sys.executable,
+                    str(server_script),
+                    self.tool,
+                    str(self.prefix),
+                    str(write_fd),
+                ],
+                env=self.env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(write_fd,),
+                text=True,
+            )
+        finally:
+            os.close(write_fd)
+        self.responses = os.fdopen(read_fd, "r")
+
+    def run(self, args):
+        """Run the tool with ``args``, and return its exit code, stdout,
+        and stderr.
+
+        Raises:
+            CommandServerError: if the server is not usable (e.g. it could
+                not import the tool)
+        """
+        if self.proc is None:
+            self.start()
+
+        request = {"args": list(args), "cwd": os.getcwd()}
+        try:
+            self.proc.stdin.write(json.dumps(request) + "\n")
+            self.proc.stdin.flush()
+            line = self.responses.readline()
+        except (BrokenPipeError, OSError) as e:
+            raise CommandServerError(str(e))
+        if not line:
+            raise CommandServerError(f"{self.tool} command server exited")
+
+        response = json.loads(line)
+        return response["returncode"], response["stdout"], response["stderr"]
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.proc.kill()
+        self.responses.close()
+        self.proc = None
+
+
+#: CommandServers by (executable, environment); None if a server failed
+_command_servers = {}
+
+
+@atexit.register
+def _close_command_servers():
+    for server in _command_servers.values():
+        if server:
+            server.close()
+    _command_servers.clear()
 
 
 class Command:
@@ -61,10 +413,43 @@ class Command:
         self.exe_path = exe_path
         self.env = env
 
-    def __call__(self, *args):
+    def _server_key(self):
+        return (str(self.exe_path), json.dumps(self.env, sort_keys=True))
+
+    def _server(self):
+        exe_path = pathlib.Path(self.exe_path)
+        if not USE_COMMAND_SERVER or exe_path.name not in ("ramble", "spack"):
+            return None
+
+        key = self._server_key()
+        if key not in _command_servers:
+            _command_servers[key] = CommandServer(
+                exe_path.name, exe_path.parents[1], self.env
+            )
+        return _command_servers[key]
+
+    def __call__(self, *args, timeout=None, on_output=None):
         opts_str = " ".join(args)
         cmd_str = f"{self.exe_path} {opts_str}"
-        return run_command(cmd_str, env=self.env)
+
+        # The server can't stream output, or stop a command that hangs
+        server = None if (timeout or on_output) else self._server()
+        if server:
+            try:
+                returncode, stdout, stderr = server.run(shlex.split(opts_str))
+            except CommandServerError as e:
+                debug_print(f"Not using command server for {self.exe_path}: {e}")
+                server.close()
+                _command_servers[self._server_key()] = None
+            else:
+                if returncode != 0:
+                    raise RuntimeError(
+                        f"Failed command (exit {returncode}): {cmd_str}\n"
+                        f"Output: {stdout}\nError: {stderr}"
+                    )
+                return (stdout, stderr)
+
+        return run_command(cmd_str, env=self.env, timeout=timeout, on_output=on_output)
 
 
 class RuntimeResources:
@@ -81,10 +466,18 @@ class RuntimeResources:
         self.ramble_location = self.dest / "ramble"
         self.spack_location = self.dest / "spack"
 
+        # Clones of the pinned commits, shared by all experiments_roots
+        self.cache_location = (
+            benchpark.paths.runtimes_path / f"{self.ramble_commit}-{self.spack_commit}"
+        )
+
+        # Names of the tools that were cloned by this instance
+        self._installed = set()
+
     def bootstrap(self):
-        print("Hold tight, Benchpark is bootstrapping itself.")
-        if not self.ramble_location.exists():
-            self._install_ramble()
+        if not self.ramble_location.exists() or not self.spack_location.exists():
+            print("Hold tight, Benchpark is bootstrapping itself.")
+        self.install()
         ramble_lib_path = self.ramble_location / "lib" / "ramble"
         externals = str(ramble_lib_path / "external")
         if externals not in sys.path:
@@ -96,46 +489,101 @@ class RuntimeResources:
         # Spack does not go in sys.path, but we will manually access modules from it
         # The reason for this oddity is that spack modules will compete with the internal
         # spack modules from ramble
+
+    def install(self):
+        """Clone whichever of Ramble and Spack are missing, concurrently."""
+        installers = []
+        if not self.ramble_location.exists():
+            installers.append(self._install_ramble)
         if not self.spack_location.exists():
-            self._install_spack()
+            installers.append(self._install_spack)
+        if not installers:
+            return
+
+        with ThreadPoolExecutor(max_workers=len(installers)) as executor:
+            for future in [executor.submit(x) for x in installers]:
+                future.result()
+
+    def _install(self, name, url, commit, location, global_location):
+        """Check out ``commit`` of ``url`` at ``location``.
+
+        The clones in benchpark_home are used directly. Anywhere else,
+        ``location`` is a git worktree of the clone in benchpark_home if it
+        has ``commit`` checked out, or else of a clone in the runtime cache,
+        so every experiments_root that uses the same commits shares one
+        object store (but has its own files, including site configs).
+        """
+        if self.dest == benchpark.paths.benchpark_home:
+            git_clone_commit(url, commit, location)
+        else:
+            if _head_commit(global_location).startswith(commit):
+                shared = global_location
+            else:
+                shared = self._cached_clone(name, url, commit, global_location)
+            # Worktrees of deleted experiments_roots are only forgotten once
+            # they have been missing for a while, so that roots that are
+            # moved or on unmounted filesystems keep working; --force
+            # reuses the path of one that is missing but still registered
+            run_command(f"git -C {shared} worktree prune --expire 3.months.ago")
+            run_command(
+                f"git -C {shared} worktree add --quiet --force --detach "
+                f"{location} {commit}"
+            )
+        self._installed.add(name)
+
+    def _cached_clone(self, name, url, commit, global_location):
+        """A clone of ``commit`` in the runtime cache, without any files
+        checked out (they are in the worktrees).
+        """
+        cached = self.cache_location / name
+        if cached.exists():
+            return cached
+        try:
+            git_clone_commit(
+                url, commit, cached, reference=global_location, checkout=False
+            )
+        except OSError:
+            # Someone else finished populating the cache first
+            if not cached.exists():
+                raise
+        return cached
 
     def _install_ramble(self):
         print(f"Cloning Ramble to {self.ramble_location}")
-        git_clone_commit(
+        self._install(
+            "ramble",
             "https://github.com/GoogleCloudPlatform/ramble.git",
             self.ramble_commit,
             self.ramble_location,
+            benchpark.paths.global_ramble_path,
         )
         debug_print(f"Done cloning Ramble ({self.ramble_location})")
 
     def _install_spack(self):
         print(f"Cloning Spack to {self.spack_location}")
-        git_clone_commit(
-            "https://github.com/spack/spack.git", self.spack_commit, self.spack_location
+        self._install(
+            "spack",
+            "https://github.com/spack/spack.git",
+            self.spack_commit,
+            self.spack_location,
+            benchpark.paths.global_spack_path,
         )
         debug_print(f"Done cloning Spack ({self.spack_location})")
 
     def _ramble(self):
-        first_time = False
         if not self.ramble_location.exists():
-            first_time = True
             self._install_ramble()
+        first_time = "ramble" in self._installed
+        self._installed.discard("ramble")
         return Command(self.ramble_location / "bin" / "ramble", env={}), first_time
 
     def _spack(self):
         env = {"SPACK_DISABLE_LOCAL_CONFIG": "1"}
         spack = Command(self.spack_location / "bin" / "spack", env)
-        spack_cache_location = self.spack_location / "misc-cache"
-        first_time = False
         if not self.spack_location.exists():
-            first_time = True
             self._install_spack()
-            spack(
-                "config",
-                "--scope=site",
-                "add",
-                f"config:misc_cache:{spack_cache_location}",
-            )
+        first_time = "spack" in self._installed
+        self._installed.discard("spack")
         return spack, first_time
 
     def spack_first_time_setup(self):
@@ -149,3 +597,70 @@ class RuntimeResources:
 
     def ramble(self):
         return self._ramble()[0]
+
+    def update_site_config(self, tool, sections):
+        """Merge config ``sections`` into the site scope of ``tool`` ("spack"
+        or "ramble"), e.g.::
+
+            update_site_config("ramble", {"repos": ["/path/to/repo"]})
+
+        Each section file is read and written once regardless of how many
+        settings it receives (``<tool> config add`` rewrites the file for
+        every setting), and the tool is then run once to read back all of
+        the sections, which validates them against the tool's schema.
+        """
+        location = {"spack": self.spack_location, "ramble": self.ramble_location}
+        scope_dir = location[tool] / "etc" / tool
+        scope_dir.mkdir(parents=True, exist_ok=True)
+
+        for section, values in sections.items():
+            section_path = scope_dir / f"{section}.yaml"
+            data = {}
+            if section_path.exists():
+                with open(section_path, "r") as f:
+                    data = yaml.safe_load(f) or {}
+            data[section] = _merge_config(data.get(section), values)
+            with open(section_path, "w") as f:
+                yaml.safe_dump(data, f, default_flow_style=False)
+
+        command = getattr(self, tool)()
+        validate = (
+            f"import {tool}.config\n"
+            f"for section in {list(sections)!r}:\n"
+            f"    {tool}.config.get(section, scope='site')"
+        )
+        command("python", "-c", shlex.quote(validate))
+
+
+def _merge_config(dst, src):
+    """Merge ``src`` into ``dst`` like ``<tool> config add`` does: dicts
+    are merged recursively, list entries from ``src`` go first, and any
+    other value in ``src`` replaces the one in ``dst``.
+    """
+    if isinstance(dst, dict) and isinstance(src, dict):
+        merged = dict(dst)
+        for key, value in src.items():
+            merged[key] = _merge_config(dst.get(key), value)
+        return merged
+    if isinstance(dst, list) and isinstance(src, list):
+        return src + [x for x in dst if x not in src]
+    return src
+
+
+_bootstrapper = None
+
+
+def bootstrap():
+    """Make Ramble importable in this process, cloning it (and Spack) into
+    ``benchpark_home`` if needed.
+
+    This only does work the first time it is called in a process, and
+    should be called by modules that import from Ramble/Spack rather than
+    by commands that do not need them (e.g. ``benchpark list``).
+    """
+    global _bootstrapper
+    if _bootstrapper is None:
+        bootstrapper = RuntimeResources(benchpark.paths.benchpark_home)
+        bootstrapper.bootstrap()
+        _bootstrapper = bootstrapper
+    return _bootstrapper
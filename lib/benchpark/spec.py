@@ -5,21 +5,27 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import collections
+import concurrent.futures
 import enum
+import functools
 import io
+import itertools
 import json
 import pathlib
 import re
-from typing import Iterable, Iterator, List, Match, Optional, Union
+from typing import Iterable, Iterator, List, Match, Optional, Tuple, Union
 
+from benchpark.error import BenchparkError
 import benchpark.paths
 import benchpark.repo
 import benchpark.runtime
+import benchpark.variant
 
-bootstrapper = benchpark.runtime.RuntimeResources(benchpark.paths.benchpark_home)
-bootstrapper.bootstrap()
+benchpark.runtime.bootstrap()
 
 import llnl.util.lang  # noqa
+import ramble.repository  # noqa
 
 repo_path = benchpark.repo.paths[benchpark.repo.ObjectTypes.experiments]
 sys_repo = benchpark.repo.paths[benchpark.repo.ObjectTypes.systems]
@@ -33,7 +39,7 @@ class VariantMap(llnl.util.lang.HashableMap):
 
     def __setitem__(self, name: str, values: Union[str, Iterable]):
         if name in self.dict:
-            raise Exception(f"Cannot specify variant {name} twice")
+            raise InvalidVariantError(f"Cannot specify variant {name} twice")
         if isinstance(values, str):
             values = (values,)
         else:
@@ -189,12 +195,9 @@ class Spec(object):
         self._variants = other.variants
 
     def _parse(self, string: str):
-        specs = SpecParser(
-            type(self), string
-        ).all_specs()  # parse spec of appropriate type
-        assert len(specs) == 1, f"{string} does not parse to one spec"
-
-        self._dup(specs[0])
+        self._name, self._namespace, variants = parse_template(string)
+        self._variants = VariantMap()
+        self._variants.dict = dict(variants)
 
     def intersects(self, other: Union[str, "Spec"]) -> bool:
         if not isinstance(other, Spec):
@@ -223,12 +226,12 @@ class Spec(object):
             other = Spec(other)
         if other.name:
             if self.name and self.name != other.name:
-                raise Exception
+                raise UnsatisfiableSpecError(f"{self} does not satisfy {other}")
             self.name == other.name
 
         if other.namespace:
             if self.namespace and self.namespace != other.namespace:
-                raise Exception
+                raise UnsatisfiableSpecError(f"{self} does not satisfy {other}")
             self.namespace == other.namespace
 
         self.variants.constrain(other.variants)
@@ -246,7 +249,7 @@ class Spec(object):
 class ExperimentSpec(Spec):
     @property
     def experiment_class(self):
-        return repo_path.get_obj_class(self.name)
+        return _experiment_class(self.name)
 
     @property
     def object_class(self):
@@ -290,8 +293,11 @@ class ConcreteSpec(Spec):
         if not self.name:
             raise AnonymousSpecError(f"Cannot concretize anonymous {type(self)} {self}")
 
+        object_class = self.object_class
+        index = variant_index(object_class)
+
         if not self.namespace:
-            self._namespace = self.object_class.namespace
+            self._namespace = object_class.namespace
 
         # For variants that are set, set whatever they imply
         variants_to_check = set(
@@ -304,13 +310,14 @@ class ConcreteSpec(Spec):
 
             conditions = [
                 w
-                for w, v_by_n in self.object_class.variants.items()
-                for n, v in v_by_n.items()
-                if n == name and v.validate_values_bool(values)
+                for w, v in index.definitions.get(name, ())
+                if v.validate_values_bool(values)
             ]
 
             if not conditions:
-                raise Exception(f"{name} is not a valid variant of {self.name}")
+                raise InvalidVariantError(
+                    f"{name} is not a valid variant of {self.name}"
+                )
 
             # This variant is already valid on self
             if any(self.satisfies(c) for c in conditions):
@@ -323,36 +330,69 @@ class ConcreteSpec(Spec):
                     variants_to_check.add((n, v))
             self.constrain(cond)
 
-        # Concretize variants that aren't set
-        changed = True
-        while changed:
-            changed = False
+        # Concretize variants that aren't set. A definition only needs to be
+        # looked at again when a variant its condition depends on is set.
+        worklist = collections.deque(range(len(index.entries)))
+        queued = set(worklist)
+        while worklist:
+            i = worklist.popleft()
+            queued.discard(i)
+            when, name, variant = index.entries[i]
+            if name in self.variants or not self.satisfies(when):
+                continue
 
-            for when, variants_by_name in self.object_class.variants.items():
-                for name, variant in variants_by_name.items():
-                    if self.satisfies(when):
-                        if name not in self.variants:
-                            changed = True
-                            self._variants[name] = variant.default
+            self._variants[name] = variant.default
+            for j in index.dependents.get(name, ()):
+                if j not in queued and index.entries[j][1] not in self.variants:
+                    worklist.append(j)
+                    queued.add(j)
 
         # Validate all set variant values
         for name, values in self.variants.items():
             try:
                 variant = next(
-                    v
-                    for w, v_by_n in self.object_class.variants.items()
-                    for n, v in v_by_n.items()
-                    if self.satisfies(w) and n == name
+                    v for w, v in index.definitions.get(name, ()) if self.satisfies(w)
                 )
             except StopIteration:
-                raise Exception(f"{name} is not a valid variant of {self.name}")
+                raise InvalidVariantError(
+                    f"{name} is not a valid variant of {self.name}"
+                )
 
-            variant.validate_values(self.variants[name])
+            variant.validate_values(values)
 
         # Convert to immutable type
         self._variants = ConcreteVariantMap(self.variants)
 
 
+class VariantIndex:
+    """Variant definitions of an Experiment/System class, arranged for
+    concretization.
+
+    Attributes:
+        entries: every ``(when, name, variant)`` in declaration order
+        definitions: variant name -> its ``(when, variant)`` definitions
+        dependents: variant name -> positions in ``entries`` of the
+            definitions whose ``when`` condition refers to that variant
+    """
+
+    def __init__(self, object_class):
+        self.entries = []
+        self.definitions = collections.defaultdict(list)
+        self.dependents = collections.defaultdict(list)
+        for when, variants_by_name in object_class.variants.items():
+            for name, variant in variants_by_name.items():
+                for when_name in when.variants:
+                    self.dependents[when_name].append(len(self.entries))
+                self.entries.append((when, name, variant))
+                self.definitions[name].append((when, variant))
+
+
+@functools.lru_cache(maxsize=None)
+def variant_index(object_class) -> VariantIndex:
+    """Return the (cached) ``VariantIndex`` for an Experiment/System class."""
+    return VariantIndex(object_class)
+
+
 class ConcreteExperimentSpec(ConcreteSpec, ExperimentSpec):
     @property
     def experiment(self) -> "benchpark.Experiment":
@@ -362,12 +402,7 @@ class ConcreteExperimentSpec(ConcreteSpec, ExperimentSpec):
 class SystemSpec(Spec):
     @property
     def system_class(self):
-        cls = sys_repo.get_obj_class(self.name)
-        # TODO: this shouldn't be necessary, but .template_dir isn't working
-        cls.resource_location = pathlib.Path(
-            sys_repo.filename_for_object_name(self.name)
-        ).parent
-        return cls
+        return _system_class(self.name)
 
     @property
     def object_class(self):
@@ -384,6 +419,149 @@ class ConcreteSystemSpec(ConcreteSpec, SystemSpec):
         return self.system_class(self)
 
 
+# Looking up a class goes through the repo each time; classes don't change
+# while Benchpark runs, so look each one up once
+@functools.lru_cache(maxsize=None)
+def _experiment_class(name: str):
+    return repo_path.get_obj_class(name)
+
+
+@functools.lru_cache(maxsize=None)
+def _system_class(name: str):
+    cls = sys_repo.get_obj_class(name)
+    # TODO: this shouldn't be necessary, but .template_dir isn't working
+    cls.resource_location = pathlib.Path(sys_repo.filename_for_object_name(name)).parent
+    return cls
+
+
+def _concretize_one(spec_type, spec):
+    try:
+        return spec_type(spec).concretize()
+    except INVALID_SPEC_ERRORS as e:
+        return e
+
+
+def concretize_many(
+    specs: Iterable[Union[str, Spec]],
+    spec_type: type = ExperimentSpec,
+    processes: Optional[int] = None,
+) -> List[Union[ConcreteSpec, Exception]]:
+    """Concretize many specs at once.
+
+    Identical specs are only concretized once, and class lookups and variant
+    indexes are shared between all of them.
+
+    Args:
+        specs: abstract specs, or strings to parse as ``spec_type``
+        spec_type: ``ExperimentSpec`` or ``SystemSpec``
+        processes: if given, concretize in a pool of that many processes
+
+    Returns:
+        The concrete spec for each input, in input order. If a spec is not
+        valid (see ``INVALID_SPEC_ERRORS``), its entry is the exception that
+        was raised instead. Any other error is raised.
+    """
+    abstract = []
+    failed = {}
+    for i, spec in enumerate(specs):
+        try:
+            abstract.append(spec_type(spec))
+        except INVALID_SPEC_ERRORS as e:
+            abstract.append(None)
+            failed[i] = e
+
+    unique = list(dict.fromkeys(str(s) for s in abstract if s is not None))
+    if processes and len(unique) > 1:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            chunksize = max(1, len(unique) // (4 * processes))
+            results = executor.map(
+                functools.partial(_concretize_one, spec_type),
+                unique,
+                chunksize=chunksize,
+            )
+            concrete = dict(zip(unique, results))
+    else:
+        concrete = {s: _concretize_one(spec_type, s) for s in unique}
+
+    return [
+        failed[i] if spec is None else concrete[str(spec)]
+        for i, spec in enumerate(abstract)
+    ]
+
+
+#: A ``{a,b,...}`` group in a spec pattern, or a quoted string to leave alone
+EXPANSION = re.compile(r"""(['"])(?:\\.|(?!\1).)*\1|\{([^{}]*)\}""")
+
+
+def expand(pattern: str) -> Iterator[str]:
+    """Lazily generate every spec string that a pattern stands for.
+
+    Each ``{a,b,...}`` group in the pattern is replaced by one of its
+    alternatives, and all combinations are generated, e.g.
+    ``amg2023 programming_model={openmp,cuda} {+caliper,~caliper}`` stands for
+    four specs. A pattern without groups generates only itself.
+    """
+    pieces = []
+    end = 0
+    for match in EXPANSION.finditer(pattern):
+        if match.group(2) is None:
+            continue
+        pieces.append((pattern[end : match.start()],))
+        pieces.append(tuple(x.strip() for x in match.group(2).split(",")))
+        end = match.end()
+    pieces.append((pattern[end:],))
+
+    for choice in itertools.product(*pieces):
+        yield "".join(choice)
+
+
+def is_pattern(string: str) -> bool:
+    """Whether ``string`` has any ``{a,b,...}`` group for ``expand``."""
+    return any(m.group(2) is not None for m in EXPANSION.finditer(string))
+
+
+def concretize_expansion(
+    pattern: str, spec_type: type = ExperimentSpec
+) -> Iterator[Tuple[str, Union[ConcreteSpec, Exception]]]:
+    """Lazily concretize every spec a pattern stands for (see ``expand``).
+
+    Yields ``(spec_string, result)``, where ``result`` is the concrete spec,
+    or the exception raised for a combination that is not valid (see
+    ``INVALID_SPEC_ERRORS``), e.g. one that sets a variant whose ``when``
+    condition it does not satisfy. Any other error is raised.
+    """
+    for string in expand(pattern):
+        yield string, _concretize_one(spec_type, string)
+
+
+def combinations_pattern(name: str, spec_type: type = ExperimentSpec) -> str:
+    """A pattern (see ``expand``) for every combination of the values of the
+    variants of an Experiment/System.
+
+    Variants without a fixed set of values keep their default. Variants that
+    only exist under a ``when`` condition may also be left unset.
+    """
+    index = variant_index(spec_type(name).object_class)
+    pattern = [name]
+    for variant_name, definitions in index.definitions.items():
+        alternatives = []
+        for when, variant in definitions:
+            if variant.values is None:
+                continue
+            if when.name or when.variants:
+                alternatives.append("")
+            for value in variant.values:
+                alternatives.append(
+                    VariantMap.stringify(variant_name, (str(value),))
+                )
+        alternatives = list(llnl.util.lang.dedupe(alternatives))
+        if len(alternatives) > 1:
+            pattern.append("{" + ",".join(alternatives) + "}")
+        elif alternatives and alternatives[0]:
+            pattern.append(alternatives[0])
+    return " ".join(pattern)
+
+
 # PARSING STUFF BELOW HERE
 
 #: Valid name for specs and variants. Here we are not using
@@ -666,14 +844,48 @@ class SpecParser(object):
         return list(iter(self.next_spec, None))
 
 
+#: How many distinct spec strings ``parse_template`` remembers
+PARSE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_template(
+    string: str,
+) -> Tuple[Optional[str], Optional[str], Tuple[Tuple[str, tuple], ...]]:
+    """Parse a string holding exactly one spec into an immutable
+    ``(name, namespace, ((variant, values), ...))`` tuple.
+
+    Results are cached, so the literals that experiments and systems
+    repeatedly pass to ``Spec.satisfies`` etc. are only tokenized once.
+    """
+    specs = SpecParser(Spec, string).all_specs()
+    assert len(specs) == 1, f"{string} does not parse to one spec"
+
+    spec = specs[0]
+    return spec.name, spec.namespace, tuple(spec.variants.items())
+
+
 # ERROR HANDLING BELOW HERE
 
 
-class AnonymousSpecError(Exception):
+class SpecError(BenchparkError):
+    """A spec that cannot be parsed or concretized"""
+
+
+class AnonymousSpecError(SpecError):
     pass
 
 
-class SpecTokenizationError(Exception):
+class InvalidVariantError(SpecError):
+    """A variant that the Experiment/System does not have, or that is set
+    more than once"""
+
+
+class UnsatisfiableSpecError(SpecError):
+    """A spec that conflicts with a condition it must satisfy"""
+
+
+class SpecTokenizationError(SpecError):
     """Syntax error in a spec string"""
 
     def __init__(self, matches, text):
@@ -689,3 +901,12 @@ class SpecTokenizationError(Exception):
 
         message += underline
         super().__init__(message)
+
+
+#: Errors that mean a spec is not valid, as opposed to a bug: they are
+#: returned as results by ``concretize_many`` and ``concretize_expansion``
+INVALID_SPEC_ERRORS = (
+    SpecError,
+    benchpark.variant.InvalidVariantValueError,
+    ramble.repository.UnknownEntityError,
+)
@@ -3,23 +3,25 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import copy
+import functools
 import hashlib
 import importlib.util
 import os
 import pathlib
 import sys
+import tempfile
 
 import benchpark.paths
 from benchpark.directives import ExperimentSystemBase
 import benchpark.repo
-from benchpark.runtime import RuntimeResources
+import benchpark.runtime
 
 from typing import Dict, Tuple
 import benchpark.spec
 import benchpark.variant
 
-bootstrapper = RuntimeResources(benchpark.paths.benchpark_home)  # noqa
-bootstrapper.bootstrap()  # noqa
+bootstrapper = benchpark.runtime.bootstrap()  # noqa
 
 import ramble.config as cfg  # noqa
 import ramble.language.language_helpers  # noqa
@@ -46,18 +48,78 @@ def load_schema(schema_id, schema_path):
     return schema
 
 
-packages_schema = load_schema(
-    "spack.schema.packages",
-    f"{bootstrapper.spack_location}/lib/spack/spack/schema/packages.py",
-)
-compilers_schema = load_schema(
-    "spack.schema.compilers",
-    f"{bootstrapper.spack_location}/lib/spack/spack/schema/compilers.py",
-)
+@functools.lru_cache(maxsize=None)
+def _schema_module(schema_id):
+    # Loading the schemas imports part of Spack, so only do it on first use
+    return load_schema(schema_id, schemas[schema_id])
+
+
+def __getattr__(name):
+    # packages_schema and compilers_schema are loaded when first accessed
+    schema_id = {
+        "packages_schema": "spack.schema.packages",
+        "compilers_schema": "spack.schema.compilers",
+    }.get(name)
+    if schema_id is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _schema_module(schema_id)
+
+
+@functools.lru_cache(maxsize=None)
+def _validated_config(path, mtime_ns, size, schema_id):
+    return cfg.read_config_file(path, _schema_module(schema_id).schema)
+
+
+def read_config_file(path, schema_id):
+    """Read and validate a config file, using the result from the last time
+    it was read if it has not changed since. The result is a copy, so it can
+    be modified.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return copy.deepcopy(
+        _validated_config(path, stat.st_mtime_ns, stat.st_size, schema_id)
+    )
 
 
 _repo_path = benchpark.repo.paths[benchpark.repo.ObjectTypes.systems]
 
+#: How many generated configs to keep in the ad-hoc config store
+ADHOC_CONFIGS_MAX = 512
+
+#: Used configs are touched at most this often (seconds), so that reading
+#: them again soon after does not invalidate the validated copy; configs
+#: used more recently than this are never evicted, since another process
+#: (e.g. a ``system init -j`` worker) may be about to read them
+_ADHOC_TOUCH_INTERVAL = 3600
+
+
+def adhoc_config(content, store=benchpark.paths.adhoc_configs_path):
+    """Path to a config file with the given content.
+
+    Files are stored under their content hash, so identical generated
+    configs are written (and validated, see ``read_config_file``) once.
+    The least recently used files are removed when there are too many.
+    """
+    store = pathlib.Path(store)
+    path = store / f"{_hash_id([content])}.yaml"
+    try:
+        benchpark.paths.touch_stored(path, _ADHOC_TOUCH_INTERVAL)
+        return path
+    except FileNotFoundError:
+        pass
+
+    store.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=store, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+    benchpark.paths.evict_stored(
+        store, "*.yaml", ADHOC_CONFIGS_MAX, _ADHOC_TOUCH_INTERVAL
+    )
+    return path
+
 
 def _hash_id(content_list):
     sha256_hash = hashlib.sha256()
@@ -115,14 +177,20 @@ system:
     def system_uid(self):
         return _hash_id([str(self.spec)])
 
-    def _merge_config_files(self, schema, selections, dst_path):
-        data = cfg.read_config_file(selections[0], schema)
+    def _merge_config_files(self, schema_id, selections, dst_path):
+        data = read_config_file(selections[0], schema_id)
         for selection in selections[1:]:
-            cfg.merge_yaml(data, cfg.read_config_file(selection, schema))
+            cfg.merge_yaml(data, read_config_file(selection, schema_id))
 
         with open(dst_path, "w") as outstream:
             syaml.dump_config(data, outstream)
 
+    def adhoc_cfg(self, content):
+        """Path to a config file with the given content, for generated
+        configs (see ``adhoc_config``).
+        """
+        return adhoc_config(content)
+
     def external_pkg_configs(self):
         return None
 
@@ -138,7 +206,7 @@ system:
         os.makedirs(aux, exist_ok=True)
         aux_packages = aux / "packages.yaml"
 
-        self._merge_config_files(packages_schema.schema, selections, aux_packages)
+        self._merge_config_files("spack.schema.packages", selections, aux_packages)
 
     def compiler_description(self, output_dir):
         selections = self.compiler_configs()
@@ -149,7 +217,7 @@ system:
         os.makedirs(aux, exist_ok=True)
         aux_compilers = aux / "compilers.yaml"
 
-        self._merge_config_files(compilers_schema.schema, selections, aux_compilers)
+        self._merge_config_files("spack.schema.compilers", selections, aux_compilers)
 
     def system_specific_variables(self):
         return {}
@@ -0,0 +1,179 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+import pytest
+
+import benchpark.allocation
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_solve_allocations(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    modifier = benchpark.allocation.modifier()
+
+    solved, errors = modifier.solve_allocations(
+        {
+            "n_ranks": [8, None, None, 4, None, None, 1001],
+            "n_nodes": [None, 2, None, None, None, None, None],
+            "n_ranks_per_node": [None, 3, None, None, None, None, None],
+            "n_gpus": [None, None, 12, None, None, None, None],
+            "n_threads_per_proc": [2, None, None, 8, None, None, None],
+            "sys_cores_per_node": 4,
+            "sys_gpus_per_node": [8, 8, 8, 8, 8, None, 8],
+        },
+        use_numpy=use_numpy,
+    )
+
+    assert [int(x) for x in solved["n_ranks"][:3]] == [8, 6, 12]
+    assert [int(x) for x in solved["n_nodes"][:3]] == [4, 2, 3]
+    assert [int(x) for x in solved["n_threads_per_proc"][:3]] == [2, 1, 1]
+    assert errors == {
+        3: modifier.ERR_CORES_PER_RANK,
+        4: modifier.ERR_NO_REQUEST,
+        5: modifier.ERR_NO_REQUEST,
+        6: "Request exceeds maximum: n_ranks/1001/1000",
+    }
+
+
+def test_solve_sweep():
+    requests = benchpark.allocation.sweep(
+        {"n_ranks": [1, 36, 37], "n_threads_per_proc": [1, 2]}
+    )
+    solved, errors = benchpark.allocation.solve("LLNL-Ruby-icelake-OmniPath", requests)
+    assert [int(x) for x in solved["n_nodes"]] == [1, 1, 1, 2, 1, 2]
+    assert not errors
+
+
+def test_pack_experiments():
+    modifier = benchpark.allocation.modifier()
+    experiments = [(1, 60, f"one_{i}") for i in range(6)] + [
+        (2, 120, "two_0"),
+        (4, 30, "four_0"),
+    ]
+    allocations = modifier.pack_experiments(experiments, 4, 120)
+
+    assert [(x.n_nodes, x.timeout) for x in allocations] == [(4, 120), (4, 90)]
+    assert allocations[0].shelves == [["two_0", "one_0", "one_1"]]
+    assert allocations[0].node_offsets == [[0, 2, 3]]
+    assert allocations[1].shelves == [["one_2", "one_3", "one_4", "one_5"], ["four_0"]]
+    assert allocations[1].node_offsets == [[0, 1, 2, 3], [0]]
+
+    v = benchpark.allocation.system_variables("LLNL-Ruby-icelake-OmniPath")
+    script, submit = modifier.packed_driver_script(v, allocations[1])
+    assert submit == "sbatch"
+    assert "#SBATCH -N 4\n#SBATCH --time 90\n" in script
+    assert script.endswith(
+        "BENCHPARK_NODE_OFFSET=3 bash one_5 &\nwait\n\n"
+        "# Shelf 2: these run at the same time\n"
+        "BENCHPARK_NODE_OFFSET=0 bash four_0 &\nwait\n"
+    )
+
+    with pytest.raises(ValueError, match="more than an allocation can have"):
+        modifier.pack_experiments([(8, 30, "eight")], 4, 120)
+
+
+@pytest.mark.parametrize("scheduler", ["slurm", "flux"])
+def test_packed_experiments_are_exclusive(scheduler):
+    modifier = benchpark.allocation.modifier()
+    allocation = modifier.Allocation.__new__(modifier.Allocation)
+    commands = {}
+    for mode in ["standard", "packed"]:
+        allocation._usage_mode = mode
+        v = modifier.AttrDict.from_dict(
+            {"scheduler": scheduler, "n_ranks": 4, "n_nodes": 2, "timeout": 30}
+        )
+        allocation.determine_scheduler_instructions(v)
+        commands[mode] = v.mpi_command.split()
+
+    assert "--exclusive" in commands["packed"]
+    if scheduler == "slurm":
+        assert "--exclusive" not in commands["standard"]
+        # Each step also starts at the node the driver script gives it
+        assert "--relative=$BENCHPARK_NODE_OFFSET" in commands["packed"]
+
+
+def test_array_groups():
+    modifier = benchpark.allocation.modifier()
+    scripts = {
+        f"exp{i}": "\n".join(
+            [
+                "#!/bin/bash",
+                f"{modifier.SUBMIT_HEADER} mode=array n_nodes={i % 2 + 1} timeout=60",
+                f"#BSUB -nnodes {i % 2 + 1}",
+                "#BSUB -W 01:00",
+                "lrun -n 4 app",
+            ]
+        )
+        for i in range(5)
+    }
+    assert modifier.parse_submit_header(scripts["exp1"]) == {
+        "mode": "array",
+        "n_nodes": 2,
+        "timeout": 60,
+    }
+
+    groups = modifier.array_groups(
+        (modifier.batch_directives("lsf", script), name)
+        for name, script in scripts.items()
+    )
+    assert groups == [
+        (("#BSUB -nnodes 1", "#BSUB -W 01:00"), ["exp0", "exp2", "exp4"]),
+        (("#BSUB -nnodes 2", "#BSUB -W 01:00"), ["exp1", "exp3"]),
+    ]
+
+    script, submit = modifier.array_driver_script("lsf", groups[0][0], "map.txt", 3)
+    assert submit == "bsub"
+    assert '#BSUB -W 01:00\n#BSUB -J "benchpark[1-3]"\n' in script
+    assert "index=$((LSB_JOBINDEX - 1))\n" in script
+
+    _, submit = modifier.array_driver_script("flux", (), "map.txt", 3)
+    assert submit == "flux batch --cc=0-2"
+
+
+class FakeExpander:
+    """Expands variables like Ramble's Expander does: references to other
+    variables in definitions are expanded. Like Ramble's, it keeps the
+    definitions in ``_variables``, unless ``private`` is False.
+    """
+
+    def __init__(self, variables, private=True):
+        self.definitions = variables
+        if private:
+            self._variables = variables
+        self.expanded = []
+
+    def expand_var(self, vref):
+        self.expanded.append(vref)
+        value = str(self.definitions[vref.strip("{}")])
+        if value.startswith("{"):
+            return self.expand_var(value)
+        return value
+
+
+def test_expand_var(monkeypatch):
+    modifier = benchpark.allocation.modifier()
+    monkeypatch.setattr(modifier, "_expansion_cache", {})
+    monkeypatch.setattr(modifier, "USE_EXPANSION_CACHE", True)
+
+    first = FakeExpander({"sys_cores_per_node": 56, "n_ranks": "{nodes}", "nodes": 2})
+    assert modifier._expand_var(first, "sys_cores_per_node") == "56"
+    assert modifier._expand_var(first, "n_ranks") == "2"
+
+    # Literal definitions are only expanded the first time they are seen,
+    # but definitions with references always are
+    second = FakeExpander({"sys_cores_per_node": 56, "n_ranks": "{nodes}", "nodes": 4})
+    assert modifier._expand_var(second, "sys_cores_per_node") == "56"
+    assert modifier._expand_var(second, "n_ranks") == "4"
+    assert second.expanded == ["{n_ranks}", "{nodes}"]
+
+    # A different literal definition is expanded
+    third = FakeExpander({"sys_cores_per_node": 112})
+    assert modifier._expand_var(third, "sys_cores_per_node") == "112"
+    assert third.expanded == ["{sys_cores_per_node}"]
+
+    # Without access to the definitions, nothing is cached
+    fourth = FakeExpander({"sys_cores_per_node": 56}, private=False)
+    assert modifier._expand_var(fourth, "sys_cores_per_node") == "56"
+    assert fourth.expanded == ["{sys_cores_per_node}"]
@@ -0,0 +1,196 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+import argparse
+import os
+
+import pytest
+
+import benchpark.cmd.setup
+from benchpark.cmd.setup import include_yaml, sync_links, tree_links
+
+
+def test_sync_links(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    for name in ["a.yaml", "b.yaml", "sub/c.yaml", ".hidden.yaml"]:
+        (src / name).write_text("")
+
+    dst = tmp_path / "dst"
+    links = tree_links(src, dst, lambda f: not f.startswith("."))
+    assert sync_links(links, [dst]) == (
+        sorted(str(dst / x) for x in ["a.yaml", "b.yaml", "sub/c.yaml"]),
+        [],
+        [],
+    )
+    assert os.readlink(dst / "sub" / "c.yaml") == str(src / "sub" / "c.yaml")
+
+    # Output from earlier runs is kept
+    (dst / "results.txt").write_text("")
+    assert sync_links(links, [dst]) == ([], [], [])
+
+    (src / "b.yaml").unlink()
+    (src / "d.yaml").write_text("")
+    links = tree_links(src, dst, lambda f: not f.startswith("."))
+    links[str(dst / "a.yaml")] = str(src / "d.yaml")
+    assert sync_links(links, [dst]) == (
+        [str(dst / "d.yaml")],
+        [str(dst / "a.yaml")],
+        [str(dst / "b.yaml")],
+    )
+    assert os.readlink(dst / "a.yaml") == str(src / "d.yaml")
+    assert (dst / "results.txt").exists()
+
+
+def test_tree_links_link_dirs(tmp_path):
+    src = tmp_path / "src"
+    for name in ["a.yaml", "only-yaml/b.yaml", "mixed/c.yaml", "mixed/d.txt"]:
+        (src / name).parent.mkdir(parents=True, exist_ok=True)
+        (src / name).write_text("")
+    (src / "no-yaml").mkdir()
+    (src / "no-yaml" / "e.txt").write_text("")
+
+    dst = tmp_path / "dst"
+    links = tree_links(src, dst, lambda f: f.endswith(".yaml"), link_dirs=True)
+    assert links == {
+        str(dst / "a.yaml"): str(src / "a.yaml"),
+        str(dst / "only-yaml"): str(src / "only-yaml"),
+        str(dst / "mixed" / "c.yaml"): str(src / "mixed" / "c.yaml"),
+    }
+
+
+def test_tree_links_skips_dir_symlinks(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "sub" / "a.yaml").write_text("")
+    (src / "linked.yaml").symlink_to(src / "sub")
+
+    # Like os.walk, symlinked directories are neither files nor descended
+    # into, even when their name looks like a file to include
+    dst = tmp_path / "dst"
+    links = tree_links(src, dst, include_yaml, link_dirs=True)
+    assert links == {str(dst / "sub"): str(src / "sub")}
+
+
+def test_tree_links_sees_changes(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "sub" / "a.yaml").write_text("")
+    dst = tmp_path / "dst"
+    assert list(tree_links(src, dst, include_yaml)) == [str(dst / "sub" / "a.yaml")]
+
+    (src / "sub" / "b.yaml").write_text("")
+    (src / "sub" / "a.yaml").unlink()
+    assert list(tree_links(src, dst, include_yaml)) == [str(dst / "sub" / "b.yaml")]
+
+
+def test_load_campaign(tmp_path):
+    campaign = tmp_path / "campaign.yaml"
+    campaign.write_text(
+        "experiments_root: /some/root\n"
+        "targets:\n"
+        "- experiment: amg2023/openmp\n"
+        "  system: cts1\n"
+        "- experiment: saxpy/cuda\n"
+        "  system: ats4\n"
+        "  modifier: caliper\n"
+    )
+    experiments_root, targets = benchpark.cmd.setup.load_campaign(campaign)
+    assert experiments_root == "/some/root"
+    assert [str(x) for x in targets] == [
+        "amg2023/openmp cts1 none",
+        "saxpy/cuda ats4 caliper",
+    ]
+
+    campaign.write_text("targets:\n- experiment: amg2023/openmp\n")
+    with pytest.raises(ValueError, match="needs an experiment and a system"):
+        benchpark.cmd.setup.load_campaign(campaign)
+
+
+@pytest.fixture()
+def fake_setup(monkeypatch, tmp_path):
+    """Replace the setup of Ramble/Spack and of each workspace: setting up
+    a workspace on the system "broken" fails. The targets that were set up
+    are listed in the returned list.
+    """
+    calls = []
+
+    def setup_workspace(experiments_root, target, clean=False, out=print):
+        calls.append(str(target))
+        if target.system == "broken":
+            raise ValueError("no such system")
+        out("Configs are up to date")
+        return experiments_root / target.experiment / target.system / "workspace"
+
+    monkeypatch.setattr(benchpark.cmd.setup, "setup_workspace", setup_workspace)
+    monkeypatch.setattr(
+        benchpark.cmd.setup, "setup_runtime", lambda root: root / "setup.sh"
+    )
+    return calls
+
+
+def test_setup_campaign(fake_setup, tmp_path, capsys):
+    Target = benchpark.cmd.setup.Target
+    targets = [
+        Target("amg2023/openmp", "cts1"),
+        Target("saxpy/openmp", "broken"),
+        Target("amg2023/openmp", "cts1", "caliper"),
+        Target("saxpy/openmp", "cts1"),
+    ]
+    failed = benchpark.cmd.setup.setup_campaign(tmp_path, targets, jobs=2)
+
+    # The second target for a workspace is not set up
+    assert failed == 2
+    assert sorted(fake_setup) == [
+        "amg2023/openmp cts1 none",
+        "saxpy/openmp broken none",
+        "saxpy/openmp cts1 none",
+    ]
+    lines = capsys.readouterr().out.splitlines()
+    # A row per target, in order: name, seconds, and the last message or
+    # the error
+    rows = [x.split(None, 4) for x in lines[2:6]]
+    assert [" ".join(x[:3]) for x in rows] == [str(x) for x in targets]
+    assert all(x[3].endswith("s") for x in rows)
+    assert [x[4] for x in rows] == [
+        "Configs are up to date",
+        "FAILED: no such system",
+        "FAILED: uses the same workspace as amg2023/openmp cts1 none",
+        "Configs are up to date",
+    ]
+    assert lines[6].startswith("2 succeeded, 2 failed in ")
+    assert lines[7] == f"To use these workspaces, first run: . {tmp_path}/setup.sh"
+
+
+def test_setup_command(fake_setup, tmp_path):
+    def args(*targets, campaign=None):
+        return argparse.Namespace(
+            targets=list(targets),
+            campaign=campaign,
+            modifier="none",
+            clean=False,
+            jobs=None,
+        )
+
+    benchpark.cmd.setup.command(
+        args("amg2023/openmp", "cts1", "saxpy/openmp", "cts1", str(tmp_path))
+    )
+    assert fake_setup == ["amg2023/openmp cts1 none", "saxpy/openmp cts1 none"]
+
+    # The experiments_root given on the command line takes precedence
+    campaign = tmp_path / "campaign.yaml"
+    campaign.write_text(
+        "experiments_root: /elsewhere\n"
+        "targets:\n"
+        "- {experiment: amg2023/openmp, system: cts1}\n"
+        "- {experiment: amg2023/openmp, system: broken}\n"
+    )
+    fake_setup.clear()
+    with pytest.raises(SystemExit) as exc:
+        benchpark.cmd.setup.command(args(str(tmp_path), campaign=str(campaign)))
+    assert exc.value.code == 1
+    assert fake_setup == ["amg2023/openmp cts1 none", "amg2023/openmp broken none"]
+
+    with pytest.raises(ValueError, match="Expected EXPERIMENT SYSTEM"):
+        benchpark.cmd.setup.command(args("amg2023/openmp", "cts1"))
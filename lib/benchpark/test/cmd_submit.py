@@ -0,0 +1,26 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+import argparse
+
+import pytest
+
+import benchpark.allocation
+from benchpark.cmd.submit import packing_limits
+
+
+@pytest.mark.parametrize(
+    "nodes,time,expected",
+    [
+        (None, None, (100, 60)),
+        (8, 30, (8, 30)),
+        (200, 240, (100, 60)),
+    ],
+)
+def test_packing_limits(nodes, time, expected):
+    v = benchpark.allocation.modifier().AttrDict.from_dict(
+        {"max_request": 100, "timeout": 60}
+    )
+    args = argparse.Namespace(nodes=nodes, time=time)
+    assert packing_limits(args, v) == expected
@@ -2,9 +2,11 @@
 # Benchpark Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: Apache-2.0
+import pytest
 import yaml
 
 import benchpark.experiment
+import benchpark.index
 import benchpark.spec
 
 
@@ -79,3 +81,88 @@ def test_default_modifiers_section():
     modifiers_section = experiment.compute_modifiers_section()
 
     assert modifiers_section == [{"name": "allocation"}]
+
+
+def test_concretize_many():
+    specs = [
+        "saxpy",
+        "saxpy programming_model=cuda",
+        "saxpy",
+        "saxpy programming_model=bogus",
+    ]
+    results = benchpark.spec.concretize_many(specs)
+
+    assert results[0] is results[2]
+    assert results[0] == benchpark.spec.ExperimentSpec("saxpy").concretize()
+    assert results[1].variants["programming_model"] == ("cuda",)
+    assert isinstance(results[3], Exception)
+
+
+class FakeSpec:
+    """Stands in for a spec type whose class is broken, except for specs
+    that set ``bogus``, which are just not valid."""
+
+    def __init__(self, string):
+        self.string = string
+
+    def __str__(self):
+        return self.string
+
+    def concretize(self):
+        if "bogus" in self.string:
+            raise benchpark.spec.InvalidVariantError(f"{self} is not valid")
+        raise AttributeError("broken class")
+
+
+def test_concretize_expansion_errors():
+    results = benchpark.spec.concretize_expansion("saxpy {bogus,ok}", FakeSpec)
+
+    spec_str, error = next(results)
+    assert spec_str == "saxpy bogus"
+    assert isinstance(error, benchpark.spec.InvalidVariantError)
+    with pytest.raises(AttributeError):
+        next(results)
+
+    with pytest.raises(AttributeError):
+        benchpark.spec.concretize_many(["saxpy bogus", "saxpy ok"], FakeSpec)
+
+
+def test_write_cached_ramble_dict(monkeypatch, tmp_path):
+    spec = benchpark.spec.ExperimentSpec("saxpy").concretize()
+
+    calls = []
+
+    def write_ramble_dict(self, filepath):
+        calls.append(filepath)
+        with open(filepath, "w") as f:
+            yaml.dump({"ramble": {}}, f)
+
+    monkeypatch.setattr(
+        benchpark.experiment.Experiment, "write_ramble_dict", write_ramble_dict
+    )
+
+    cache_dir = tmp_path / "cache"
+    for name in ["first.yaml", "second.yaml"]:
+        benchpark.experiment.write_cached_ramble_dict(
+            spec, tmp_path / name, cache_dir=cache_dir
+        )
+        with open(tmp_path / name) as f:
+            assert yaml.safe_load(f) == {"ramble": {}}
+
+    assert len(calls) == 1
+
+    # Any change to the library renders it again
+    monkeypatch.setattr(benchpark.index, "library_hash", lambda: "changed")
+    benchpark.experiment.write_cached_ramble_dict(
+        spec, tmp_path / "third.yaml", cache_dir=cache_dir
+    )
+    assert len(calls) == 2
+
+
+def test_content_hash(tmp_path):
+    def content_hash(spec_str):
+        spec = benchpark.spec.ExperimentSpec(spec_str).concretize()
+        return benchpark.experiment.content_hash(spec, cache_dir=tmp_path)
+
+    assert content_hash("saxpy") == content_hash("saxpy programming_model=openmp")
+    assert content_hash("saxpy") != content_hash("saxpy programming_model=cuda")
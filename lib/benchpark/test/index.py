@@ -0,0 +1,94 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+import importlib.util
+import os
+
+import benchpark.index
+import benchpark.paths
+import benchpark.variant
+
+EXPERIMENT = """\
+class {name}:
+    variants = {{"": {{"size": variant}}}}
+
+    def compute_spack_section(self):
+        pass
+"""
+
+
+def make_repo(tmp_path, names):
+    repo_dir = tmp_path / "experiments"
+    for name in names:
+        (repo_dir / name).mkdir(parents=True)
+        (repo_dir / name / "experiment.py").write_text(EXPERIMENT.format(name=name))
+    return repo_dir
+
+
+def test_index_only_reloads_stale_entries(tmp_path):
+    repo_dir = make_repo(tmp_path, ["a", "b"])
+    loaded = []
+
+    def load_class(name):
+        loaded.append(name)
+        path = repo_dir / name / "experiment.py"
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        module.variant = benchpark.variant.Variant(
+            "size", "1", "problem size", values=("1", "2")
+        )
+        spec.loader.exec_module(module)
+        return getattr(module, name)
+
+    def index():
+        return benchpark.index.RepoIndex(
+            repo_dir, "experiment.py", tmp_path / "index.json", load_class
+        )
+
+    entries = index().entries()
+    assert sorted(entries) == ["a", "b"]
+    assert entries["a"]["methods"] == ["compute_spack_section"]
+    assert entries["a"]["variants"] == [
+        {
+            "name": "size",
+            "when": "",
+            "default": "1",
+            "description": "problem size",
+            "values": ["1", "2"],
+            "multi": False,
+        }
+    ]
+    assert sorted(loaded) == ["a", "b"]
+
+    # A new index reads everything back from disk
+    loaded.clear()
+    assert index().entries() == entries
+    assert loaded == []
+
+    # Touching a file doesn't matter if its contents are the same
+    os.utime(repo_dir / "a" / "experiment.py", ns=(0, 0))
+    assert index().entries()["a"]["variants"] == entries["a"]["variants"]
+    assert loaded == []
+
+    (repo_dir / "b" / "experiment.py").write_text(
+        EXPERIMENT.format(name="b") + "\n    def compute_applications_section(self):\n"
+        "        pass\n"
+    )
+    entries = index().entries()
+    assert loaded == ["b"]
+    assert entries["b"]["methods"] == [
+        "compute_applications_section",
+        "compute_spack_section",
+    ]
+
+
+def test_cache_file_per_repo(tmp_path):
+    first = benchpark.index.cache_file("experiments", tmp_path / "a" / "experiments")
+    second = benchpark.index.cache_file("experiments", tmp_path / "b" / "experiments")
+    assert first != second
+    assert first.parent == second.parent == benchpark.paths.index_path
+    assert first.name.startswith("experiments-")
+    assert first == benchpark.index.cache_file(
+        "experiments", tmp_path / "a" / ".." / "a" / "experiments"
+    )
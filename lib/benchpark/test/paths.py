@@ -3,7 +3,9 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import os
 import pathlib
+import time
 
 import benchpark.paths
 
@@ -11,3 +13,25 @@ import benchpark.paths
 def test_benchpark_root(pytestconfig):
     expected_path = pathlib.Path(pytestconfig.inipath).resolve().parent
     assert benchpark.paths.benchpark_root == expected_path
+
+
+def test_evict_stored(tmp_path):
+    now = time.time()
+    for i, age in enumerate([5000, 4000, 10, 3000]):
+        path = tmp_path / f"{i}.yaml"
+        path.write_text("")
+        os.utime(path, (now - age, now - age))
+    (tmp_path / "other.tmp").write_text("")
+
+    benchpark.paths.touch_stored(tmp_path / "3.yaml", 3600)
+    benchpark.paths.touch_stored(tmp_path / "1.yaml", 1000)
+    assert (tmp_path / "1.yaml").stat().st_mtime > now - 1000
+
+    # The least recently used files go, but one used in the last 100
+    # seconds is kept even though that leaves more than one
+    benchpark.paths.evict_stored(tmp_path, "*.yaml", 1, 100)
+    assert sorted(x.name for x in tmp_path.iterdir()) == [
+        "1.yaml",
+        "2.yaml",
+        "other.tmp",
+    ]
@@ -0,0 +1,94 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+import pytest
+
+import benchpark.plan
+
+
+def test_render():
+    rows = benchpark.plan.render(
+        {
+            "variables": {
+                "n": ["1", "2"],
+                "nx": ["10", "20"],
+                "ny": ["30", "40"],
+                "threads": ["1", "2", "4"],
+                "a": ["x", "y"],
+                "b": ["u", "v"],
+                "fixed": "f",
+            },
+            "zips": {"size": ["nx", "ny"]},
+            "matrices": [{"m": ["size", "threads"]}],
+        }
+    )
+    # 2 (size) x 3 (threads) matrix, crossed with the zip of n, a and b
+    assert len(rows) == 12
+    assert rows[0] == {
+        "fixed": "f",
+        "nx": "10",
+        "ny": "30",
+        "threads": "1",
+        "n": "1",
+        "a": "x",
+        "b": "u",
+    }
+    assert set((r["nx"], r["ny"]) for r in rows) == {("10", "30"), ("20", "40")}
+
+    with pytest.raises(ValueError, match="same length"):
+        benchpark.plan.render({"variables": {"a": ["1"], "b": ["1", "2"]}})
+
+
+@pytest.mark.parametrize(
+    "expression,expected",
+    [
+        ("{x} * {y}", "6"),
+        ("{y} / {x}", "1.5"),
+        ("{name}-{x}", "amg-2"),
+        ("{undefined}", "{undefined}"),
+        ("__import__('os')", "__import__('os')"),
+    ],
+)
+def test_expand(expression, expected):
+    variables = {"x": "2", "y": "{x} + 1", "name": "amg"}
+    assert benchpark.plan.expand(expression, variables) == expected
+
+
+def test_plan():
+    ramble_dict = {
+        "ramble": {
+            "applications": {
+                "app": {
+                    "workloads": {
+                        "problem": {
+                            "experiments": {
+                                "app_{n_nodes}_{n_threads_per_proc}": {
+                                    "variables": {
+                                        "n_nodes": ["1", "2"],
+                                        "n_ranks": "8",
+                                        "n_threads_per_proc": ["4", "7", "14"],
+                                        "timeout": "30",
+                                    },
+                                    "matrix": ["n_nodes", "n_threads_per_proc"],
+                                    "exclude": {
+                                        "where": [
+                                            "{n_threads_per_proc} * {n_ranks} > "
+                                            "{n_nodes} * {sys_cores_per_node}"
+                                        ]
+                                    },
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+    # This system has 56 cores per node
+    (template,) = benchpark.plan.plan(ramble_dict, "LLNL-Ruby-icelake-OmniPath")
+    assert template.excluded == 1
+    assert len(template.experiments) == 5
+    assert not template.errors
+    assert template.n_nodes == [1, 1, 2, 2, 2]
+    assert template.node_hours == 4.0
@@ -0,0 +1,276 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+import os
+import shutil
+import signal
+import threading
+import time
+
+import pytest
+import yaml
+
+import benchpark.paths
+import benchpark.runtime
+
+FAKE_MAIN = """\
+import os
+import sys
+
+calls = []
+imported_by = os.getpid()
+
+
+def main(argv=None):
+    calls.append(argv)
+    print(f"{' '.join(argv)} ({len(calls)}, {imported_by})")
+    os.system("echo from-child")
+    print("to-stderr", file=sys.stderr)
+    if argv[0] == "fail":
+        sys.exit(3)
+"""
+
+
+@pytest.fixture()
+def fake_ramble(tmp_path, monkeypatch):
+    """A "ramble" whose main module records how many times it was called
+    with the same state and which process imported it, and whose
+    bin/ramble says it was run directly.
+    """
+    monkeypatch.setattr(benchpark.runtime, "USE_COMMAND_SERVER", True)
+    package = tmp_path / "lib" / "ramble" / "ramble"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "main.py").write_text(FAKE_MAIN)
+
+    exe = tmp_path / "bin" / "ramble"
+    exe.parent.mkdir()
+    exe.write_text('#!/bin/sh\necho "subprocess $@"\n')
+    exe.chmod(0o755)
+
+    yield benchpark.runtime.Command(exe, env=None)
+    benchpark.runtime._close_command_servers()
+
+
+def test_command_server_reuses_process(fake_ramble):
+    stdout, stderr = fake_ramble("config --scope=site add 'config:a:true'")
+    first, _, rest = stdout.partition(" (1, ")
+    assert first == "config --scope=site add config:a:true"
+    server_pid, _, rest = rest.partition(")")
+    assert rest == "\nfrom-child\n"
+    assert stderr == "to-stderr\n"
+
+    # The module was imported once, but the state from the first command
+    # is gone
+    stdout, _ = fake_ramble("repo", "add", "/some/repo")
+    assert stdout.startswith(f"repo add /some/repo (1, {server_pid})")
+
+
+def test_command_server_failure(fake_ramble):
+    with pytest.raises(RuntimeError, match="Failed command"):
+        fake_ramble("fail")
+
+
+def test_command_server_fallback(fake_ramble, tmp_path):
+    # Without an importable ramble, commands run as subprocesses
+    (tmp_path / "lib" / "ramble" / "ramble" / "main.py").unlink()
+    stdout, _ = fake_ramble("list")
+    assert stdout == "subprocess list\n"
+
+
+def test_update_site_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchpark.runtime, "USE_COMMAND_SERVER", False)
+    runtime = benchpark.runtime.RuntimeResources(tmp_path)
+    exe = runtime.ramble_location / "bin" / "ramble"
+    exe.parent.mkdir(parents=True)
+    exe.write_text('#!/bin/sh\necho "$@" >> "$(dirname "$0")/calls"\n')
+    exe.chmod(0o755)
+
+    scope_dir = runtime.ramble_location / "etc" / "ramble"
+    scope_dir.mkdir(parents=True)
+    (scope_dir / "repos.yaml").write_text("repos:\n- /existing\n")
+
+    runtime.update_site_config(
+        "ramble",
+        {
+            "config": {
+                "disable_progress_bar": True,
+                "spack": {"global": {"args": "-d"}},
+            },
+            "repos": ["/new"],
+        },
+    )
+
+    with open(scope_dir / "repos.yaml") as f:
+        assert yaml.safe_load(f) == {"repos": ["/new", "/existing"]}
+    with open(scope_dir / "config.yaml") as f:
+        assert yaml.safe_load(f) == {
+            "config": {
+                "disable_progress_bar": True,
+                "spack": {"global": {"args": "-d"}},
+            }
+        }
+    # Both sections are validated by one command
+    calls = (exe.parent / "calls").read_text()
+    assert calls == (
+        "python -c import ramble.config\n"
+        "for section in ['config', 'repos']:\n"
+        "    ramble.config.get(section, scope='site')\n"
+    )
+
+
+def test_run_command_streams_output():
+    lines = []
+    stdout, stderr = benchpark.runtime.run_command(
+        "sh -c 'echo a; echo b >&2; echo c'",
+        on_output=lambda stream, line: lines.append((stream, line)),
+    )
+    assert stdout == "a\nc\n"
+    assert stderr == "b\n"
+    assert [x for x in lines if x[0] == "stdout"] == [
+        ("stdout", "a\n"),
+        ("stdout", "c\n"),
+    ]
+    assert ("stderr", "b\n") in lines
+
+
+def test_run_command_timeout():
+    with pytest.raises(RuntimeError, match="timed out"):
+        benchpark.runtime.run_command("sh -c 'echo started; sleep 30'", timeout=0.5)
+
+
+def test_run_command_error_report_is_bounded(monkeypatch):
+    monkeypatch.setattr(benchpark.runtime, "ERROR_REPORT_LINES", 3)
+    with pytest.raises(RuntimeError) as exc:
+        benchpark.runtime.run_command(
+            "sh -c 'for i in 1 2 3 4 5 6; do echo line$i; done; exit 2'",
+            capture=False,
+        )
+    assert "line4\nline5\nline6" in str(exc.value)
+    assert "line3" not in str(exc.value)
+
+
+def test_run_commands_concurrently():
+    results = benchpark.runtime.run_commands("echo one", "sh -c 'echo two >&2'")
+    assert results == [("one\n", ""), ("", "two\n")]
+    with pytest.raises(RuntimeError, match="exit 1"):
+        benchpark.runtime.run_commands("echo one", "false")
+
+
+@pytest.fixture()
+def upstream(tmp_path):
+    """A repository with two commits, the second tagged "v2"."""
+    repo = tmp_path / "upstream"
+    git = f"git -C {repo} -c user.name=x -c user.email=x"
+    benchpark.runtime.run_command(f"git init --quiet {repo}")
+    for i in (1, 2):
+        (repo / "file").write_text(f"{i}\n")
+        benchpark.runtime.run_command(f"{git} add file")
+        benchpark.runtime.run_command(f"{git} commit --quiet -m {i}")
+    benchpark.runtime.run_command(f"{git} tag v2")
+    benchpark.runtime.run_command(f"{git} config uploadpack.allowAnySHA1InWant true")
+    stdout, _ = benchpark.runtime.run_command(f"{git} rev-list HEAD")
+    return repo, stdout.split()
+
+
+def test_git_clone_commit(upstream, tmp_path):
+    repo, (second, first) = upstream
+    url = f"file://{repo}"
+    assert benchpark.runtime.resolve_commit(url, second[:7]) == second
+    assert benchpark.runtime.resolve_commit(url, first[:7]) is None
+
+    for commit, content in ((second[:7], "2\n"), (first[:7], "1\n"), (first, "1\n")):
+        clone = tmp_path / f"clone-{commit}"
+        benchpark.runtime.git_clone_commit(url, commit, clone)
+        assert (clone / "file").read_text() == content
+
+    shallow = tmp_path / f"clone-{second[:7]}"
+    stdout, _ = benchpark.runtime.run_command(f"git -C {shallow} rev-list --all")
+    assert stdout.split() == [second]
+
+
+def test_git_clone_commit_failure(upstream, tmp_path):
+    repo, _ = upstream
+    clone = tmp_path / "clone"
+    with pytest.raises(RuntimeError, match="Failed command"):
+        benchpark.runtime.git_clone_commit(f"file://{repo}", "0" * 40, clone)
+    assert not clone.exists()
+    assert list(tmp_path.iterdir()) == [repo]
+
+
+def test_install_shares_clones(upstream, tmp_path, monkeypatch):
+    repo, (second, first) = upstream
+    url = f"file://{repo}"
+    home = tmp_path / "home"
+    monkeypatch.setattr(benchpark.paths, "runtimes_path", home / "runtimes")
+    global_clone = home / "ramble"
+    benchpark.runtime.git_clone_commit(url, second, global_clone)
+
+    def install(root, commit):
+        runtime = benchpark.runtime.RuntimeResources(root)
+        location = runtime.ramble_location
+        runtime._install("ramble", url, commit, location, global_clone)
+        return runtime, (location / "file").read_text()
+
+    # The clone in home has the commit, so it is shared
+    runtime, content = install(tmp_path / "root1", second[:7])
+    assert content == "2\n"
+    assert not runtime.cache_location.exists()
+
+    # Otherwise, a clone without a checkout is made in the cache
+    runtime, content = install(tmp_path / "root2", first)
+    assert content == "1\n"
+    assert [x.name for x in (runtime.cache_location / "ramble").iterdir()] == [".git"]
+
+    # A root that is recreated after being deleted gets a new worktree
+    shutil.rmtree(tmp_path / "root2")
+    _, content = install(tmp_path / "root2", first)
+    assert content == "1\n"
+
+
+def _running(pid):
+    """Whether a process exists and has not exited (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] not in "ZX"
+    except FileNotFoundError:
+        return False
+
+
+def _wait_until_stopped(pid):
+    for _ in range(100):
+        if not _running(pid):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+SLEEPER = "sh -c 'sleep 30 & echo $!; wait'"
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_run_command_interrupted():
+    pids = []
+
+    def on_output(stream, line):
+        pids.append(int(line))
+        signal.pthread_kill(threading.main_thread().ident, signal.SIGINT)
+
+    with pytest.raises(KeyboardInterrupt):
+        benchpark.runtime.run_command(SLEEPER, on_output=on_output)
+    assert _wait_until_stopped(pids[0])
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_run_commands_failure_stops_commands():
+    pids = []
+
+    def on_output(stream, line):
+        pids.append(int(line))
+        raise ValueError("stop")
+
+    with pytest.raises(ValueError, match="stop"):
+        benchpark.runtime.run_commands(SLEEPER, SLEEPER, on_output=on_output)
+    assert len(pids) == 2
+    assert all(_wait_until_stopped(x) for x in pids)
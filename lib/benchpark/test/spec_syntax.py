@@ -11,6 +11,8 @@ from benchpark.spec import (
     SpecTokenizationError,
     Token,
     TokenType,
+    expand,
+    parse_template,
 )
 
 
@@ -246,3 +248,31 @@ def test_error_reporting(text, expected_in_error):
 def test_error_conditions(text, match_string):
     with pytest.raises(Exception, match=match_string):
         SpecParser(Spec, text).next_spec()
+
+
+def test_parse_cache_does_not_share_variants():
+    parse_template.cache_clear()
+    first = Spec("x+debug foo=bar")
+    first.variants["baz"] = "true"
+
+    second = Spec("x+debug foo=bar")
+    assert "baz" not in second.variants
+    assert str(second) == "x+debug foo=bar"
+    assert parse_template.cache_info().hits == 1
+
+
+@pytest.mark.parametrize(
+    "pattern,expected",
+    [
+        ("x foo=bar", ["x foo=bar"]),
+        ("x foo={a,b}", ["x foo=a", "x foo=b"]),
+        (
+            "x foo={a, b} {+debug,~debug}",
+            ["x foo=a +debug", "x foo=a ~debug", "x foo=b +debug", "x foo=b ~debug"],
+        ),
+        # Braces in quoted values are left alone
+        ("x foo='{a,b}'", ["x foo='{a,b}'"]),
+    ],
+)
+def test_expand(pattern, expected):
+    assert list(expand(pattern)) == expected
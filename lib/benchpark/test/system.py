@@ -0,0 +1,40 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import time
+
+import benchpark.system
+
+
+def test_adhoc_config_reuse(tmp_path):
+    path = benchpark.system.adhoc_config("a: 1\n", tmp_path)
+    assert path.read_text() == "a: 1\n"
+
+    # The same content is stored once, under its hash
+    assert benchpark.system.adhoc_config("a: 1\n", tmp_path) == path
+    other = benchpark.system.adhoc_config("a: 2\n", tmp_path)
+    assert other != path
+    assert sorted(tmp_path.iterdir()) == sorted([path, other])
+
+
+def test_adhoc_config_eviction(monkeypatch, tmp_path):
+    monkeypatch.setattr(benchpark.system, "ADHOC_CONFIGS_MAX", 2)
+    now = time.time()
+    old = [benchpark.system.adhoc_config(f"old: {i}\n", tmp_path) for i in range(2)]
+    for i, path in enumerate(old):
+        os.utime(path, (now - 5000 + i, now - 5000 + i))
+
+    # Using a stored config again makes it the most recently used
+    assert benchpark.system.adhoc_config("old: 0\n", tmp_path) == old[0]
+    assert old[0].stat().st_mtime > now - 100
+
+    new = benchpark.system.adhoc_config("new: 0\n", tmp_path)
+    assert sorted(tmp_path.iterdir()) == sorted([old[0], new])
+
+    # Configs used within the touch interval are kept even when there are
+    # more than ADHOC_CONFIGS_MAX of them
+    newer = benchpark.system.adhoc_config("new: 1\n", tmp_path)
+    assert sorted(tmp_path.iterdir()) == sorted([old[0], new, newer])
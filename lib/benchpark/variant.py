@@ -6,6 +6,8 @@
 # SPDX-License-Identifier: Apache-2.0
 import inspect
 
+from benchpark.error import BenchparkError
+
 
 class Variant:
     """Represents a variant in a package, as declared in the
@@ -79,18 +81,22 @@ class Variant:
             pkg_cls (spack.package_base.PackageBase): the package class
                 that required the validation, if available
 
-        Raises: Exception
+        Raises: InvalidVariantValueError
         """
         # If the value is exclusive there must be at most one
         if not self.multi and len(variant_values) != 1:
-            raise Exception()
+            raise InvalidVariantValueError(
+                f"{self.name} takes one value, not {len(variant_values)}"
+            )
 
         # Check and record the values that are not allowed
         not_allowed_values = [
             x for x in variant_values if x != "*" and self.validator(x) is False
         ]
         if not_allowed_values:
-            raise ValueError(f"{not_allowed_values} are not valid values for {pkg_cls}")
+            raise InvalidVariantValueError(
+                f"{not_allowed_values} are not valid values for {pkg_cls}"
+            )
 
     def validate_values_bool(self, *args, **kwargs):
         """Wrapper around ``validate_values`` that returns boolean instead of raising."""
@@ -130,3 +136,7 @@ class Variant:
 
     def __ne__(self, other):
         return not self == other
+
+
+class InvalidVariantValueError(BenchparkError, ValueError):
+    """Values given for a variant that it does not accept"""
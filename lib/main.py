@@ -6,20 +6,15 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import argparse
+import importlib
 import inspect
 import os
 import pathlib
-import shlex
-import subprocess
 import sys
 import yaml
 
-import benchpark.cmd.audit
-import benchpark.cmd.system
-import benchpark.cmd.experiment
-import benchpark.cmd.setup
-import benchpark.cmd.unit_test
 import benchpark.paths
+import benchpark.runtime
 from benchpark.accounting import (
     benchpark_experiments,
     benchpark_modifiers,
@@ -27,7 +22,7 @@ from benchpark.accounting import (
 )
 
 
-__version__ = "0.1.0"
+__version__ = benchpark.__version__
 
 
 def main():
@@ -44,7 +39,7 @@ def main():
     actions = {}
     benchpark_list(subparsers, actions)
     benchpark_tags(subparsers, actions)
-    init_commands(subparsers, actions)
+    init_commands(subparsers, actions, chosen_subcommand(sys.argv[1:]))
 
     args, unknown_args = parser.parse_known_args()
     no_args = True if len(sys.argv) == 1 else False
@@ -87,6 +82,15 @@ def supports_unknown_args(command):
     return argcount == 2 and varnames[1] == "unknown_args"
 
 
+def chosen_subcommand(argv):
+    """Return the subcommand named on the command line, if any.
+
+    None of the top-level options take a value, so this is the first
+    argument that isn't an option.
+    """
+    return next((x for x in argv if not x.startswith("-")), None)
+
+
 def get_version():
     benchpark_version = __version__
     return benchpark_version
@@ -189,57 +193,43 @@ def benchpark_check_tag(arg_str):
     return found
 
 
-def init_commands(subparsers, actions_dict):
+#: Commands that are defined outside of this script, along with the help
+#: string shown by ``benchpark --help``. Most of these modules need Ramble
+#: (which is bootstrapped on import), so they are only imported when the
+#: command is actually invoked.
+commands = {
+    "system": ("benchpark.cmd.system", "Initialize a system config"),
+    "experiment": ("benchpark.cmd.experiment", "Interact with experiments"),
+    "setup": (
+        "benchpark.cmd.setup",
+        "Set up an experiment and prepare it to build/run",
+    ),
+    "submit": (
+        "benchpark.cmd.submit",
+        "Submit the experiments of a workspace in packed or array mode",
+    ),
+    "unit-test": ("benchpark.cmd.unit_test", "Run benchpark unit tests"),
+    "audit": ("benchpark.cmd.audit", "Look for problems in System/Experiment repos"),
+}
+
+
+def init_commands(subparsers, actions_dict, subcommand=None):
     """This function is for initializing commands that are defined outside
     of this script. It is intended that all command setup will eventually
     be refactored in this way (e.g. `benchpark_setup` will be defined in
     another file.
-    """
-    system_parser = subparsers.add_parser("system", help="Initialize a system config")
-    benchpark.cmd.system.setup_parser(system_parser)
-
-    experiment_parser = subparsers.add_parser(
-        "experiment", help="Interact with experiments"
-    )
-    benchpark.cmd.experiment.setup_parser(experiment_parser)
 
-    setup_parser = subparsers.add_parser(
-        "setup", help="Set up an experiment and prepare it to build/run"
-    )
-    benchpark.cmd.setup.setup_parser(setup_parser)
-
-    unit_test_parser = subparsers.add_parser(
-        "unit-test", help="Run benchpark unit tests"
-    )
-    benchpark.cmd.unit_test.setup_parser(unit_test_parser)
-
-    audit_parser = subparsers.add_parser(
-        "audit", help="Look for problems in System/Experiment repos"
-    )
-    benchpark.cmd.audit.setup_parser(audit_parser)
-
-    actions_dict["system"] = benchpark.cmd.system.command
-    actions_dict["experiment"] = benchpark.cmd.experiment.command
-    actions_dict["setup"] = benchpark.cmd.setup.command
-    actions_dict["unit-test"] = benchpark.cmd.unit_test.command
-    actions_dict["audit"] = benchpark.cmd.audit.command
-
-
-def run_command(command_str, env=None):
-    proc = subprocess.Popen(
-        shlex.split(command_str),
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    stdout, stderr = proc.communicate()
-    if proc.returncode != 0:
-        raise RuntimeError(
-            f"Failed command: {command_str}\nOutput: {stdout}\nError: {stderr}"
-        )
+    Every command is listed in the help, but only the module for
+    ``subcommand`` is imported and allowed to add its arguments.
+    """
+    for name, (module_name, help_str) in commands.items():
+        cmd_parser = subparsers.add_parser(name, help=help_str)
+        if name != subcommand:
+            continue
 
-    return (stdout, stderr)
+        module = importlib.import_module(module_name)
+        module.setup_parser(cmd_parser)
+        actions_dict[name] = module.command
 
 
 def benchpark_tags(subparsers, actions_dict):
@@ -264,9 +254,9 @@ def benchpark_tags(subparsers, actions_dict):
     actions_dict["tags"] = benchpark_tags_handler
 
 
-def helper_experiments_tags(ramble_exe, benchmarks):
+def helper_experiments_tags(ramble, benchmarks):
     # find all tags in Ramble applications (both in Ramble built-in and in Benchpark/repo)
-    (tags_stdout, tags_stderr) = run_command(f"{ramble_exe} attributes --tags --all")
+    (tags_stdout, tags_stderr) = ramble("attributes --tags --all")
     ramble_applications_tags = {}
     lines = tags_stdout.splitlines()
 
@@ -288,13 +278,13 @@ def benchpark_tags_handler(args):
     """
     experiments_root = pathlib.Path(os.path.abspath(args.experiments_root))
     ramble_location = experiments_root / "ramble"
-    ramble_exe = ramble_location / "bin" / "ramble"
+    ramble = benchpark.runtime.Command(ramble_location / "bin" / "ramble", env=None)
     benchmarks = benchpark_benchmarks()
 
     if args.tag:
         if benchpark_check_tag(args.tag):
             # find all applications in Ramble that have a given tag (both in Ramble built-in and in Benchpark/repo)
-            (tag_stdout, tag_stderr) = run_command(f"{ramble_exe} list -t {args.tag}")
+            (tag_stdout, tag_stderr) = ramble(f"list -t {args.tag}")
             lines = tag_stdout.splitlines()
 
             for line in lines:
@@ -303,17 +293,17 @@ def benchpark_tags_handler(args):
 
     elif args.application:
         if benchpark_check_benchmark(args.application):
-            benchpark_experiments_tags = helper_experiments_tags(ramble_exe, benchmarks)
+            benchpark_experiments_tags = helper_experiments_tags(ramble, benchmarks)
             if benchpark_experiments_tags.get(args.application) is not None:
                 print(benchpark_experiments_tags[args.application])
             else:
                 print("Benchmark {} does not exist in ramble.".format(args.application))
     else:
-        benchpark_experiments_tags = helper_experiments_tags(ramble_exe, benchmarks)
+        benchpark_experiments_tags = helper_experiments_tags(ramble, benchmarks)
         print("All tags that exist in Benchpark experiments:")
         for k, v in benchpark_experiments_tags.items():
             print(k)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
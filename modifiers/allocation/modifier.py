@@ -4,9 +4,16 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import math
+import os
+from collections.abc import Mapping
 from enum import Enum
 from ramble.modkit import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class AllocOpt(Enum):
     # Experiment resource requests
@@ -38,18 +45,22 @@ class AllocOpt(Enum):
     PRE_EXEC_CMDS = 303
 
     @staticmethod
-    def as_type(enumval, input):
-        if enumval in [
+    def is_int(enumval):
+        return enumval not in [
             AllocOpt.SCHEDULER,
             AllocOpt.QUEUE,
             AllocOpt.EXTRA_BATCH_OPTS,
             AllocOpt.EXTRA_CMD_OPTS,
             AllocOpt.POST_EXEC_CMDS,
             AllocOpt.PRE_EXEC_CMDS,
-        ]:
-            return str(input)
-        else:
+        ]
+
+    @staticmethod
+    def as_type(enumval, input):
+        if AllocOpt.is_int(enumval):
             return int(input)
+        else:
+            return str(input)
 
 
 class AllocAlias:
@@ -63,6 +74,38 @@ class AllocAlias:
 
 SENTINEL_UNDEFINED_VALUE_STR = "placeholder"
 
+# Expanding a variable is slow relative to everything else this modifier
+# does, and it runs for every experiment in a workspace. Most allocation
+# options (e.g. sys_cores_per_node, scheduler, max_request) are defined the
+# same way for every experiment, as literal values, so their expansion is
+# remembered here by (name, definition). Definitions that refer to other
+# variables are always expanded. Set BENCHPARK_ALLOCATION_CACHE=0 to turn
+# this off.
+_expansion_cache = {}
+USE_EXPANSION_CACHE = os.environ.get("BENCHPARK_ALLOCATION_CACHE", "1") != "0"
+
+
+def _expand_var(expander, name):
+    """Expand ``{name}``, using an earlier expansion of the same literal
+    definition if there was one.
+    """
+    expansion_vref = f"{{{name}}}"
+    # The definitions are private to Ramble's Expander: if they are not
+    # there (or not a mapping), e.g. with another version of Ramble, every
+    # variable is expanded without the cache
+    definitions = getattr(expander, "_variables", None)
+    if not USE_EXPANSION_CACHE or not isinstance(definitions, Mapping):
+        return expander.expand_var(expansion_vref)
+
+    raw = definitions.get(name)
+    if not isinstance(raw, (str, int)) or "{" in str(raw):
+        return expander.expand_var(expansion_vref)
+
+    key = (name, raw)
+    if key not in _expansion_cache:
+        _expansion_cache[key] = expander.expand_var(expansion_vref)
+    return _expansion_cache[key]
+
 
 class AttrDict(dict):
     """Takes variables defined in AllocOpt, and collects them into a single
@@ -121,7 +164,26 @@ class AttrDict(dict):
 
     @staticmethod
     def from_predefined_variables(expander):
-        var_defs = AttrDict._defined_allocation_options(expander)
+        return AttrDict._from_defined(AttrDict._defined_allocation_options(expander))
+
+    @staticmethod
+    def from_dict(values):
+        """Like from_predefined_variables, but for variables that are
+        already expanded, e.g. those in a system's variables.yaml.
+        """
+        var_defs = {}
+        for alloc_opt in AllocOpt:
+            val = values.get(alloc_opt.name.lower())
+            if val is None:
+                continue
+            try:
+                var_defs[alloc_opt] = AllocOpt.as_type(alloc_opt, val)
+            except ValueError:
+                continue
+        return AttrDict._from_defined(var_defs)
+
+    @staticmethod
+    def _from_defined(var_defs):
         v = AttrDict()
         for alloc_opt in AllocOpt:
             setattr(v, alloc_opt.name.lower(), var_defs.get(alloc_opt, None))
@@ -142,7 +204,7 @@ class AttrDict(dict):
         for alloc_opt in AllocOpt:
             # print(f"<---- Expanding {str(alloc_opt)}")
             expansion_vref = f"{{{alloc_opt.name.lower()}}}"
-            var_def = expander.expand_var(expansion_vref)
+            var_def = _expand_var(expander, alloc_opt.name.lower())
             # print(f"    = {str(var_def)}")
             if var_def == expansion_vref:
                 # If "{x}" expands to literal "{x}", that means it wasn't
@@ -218,17 +280,420 @@ def divide_into(dividend, divisor):
     return quotient, remainder
 
 
+# Why an experiment cannot be allocated, in the order they are checked
+ERR_NO_REQUEST = "Must specify one of: n_nodes, n_ranks, n_gpus"
+ERR_CORES_PER_RANK = (
+    "Experiment requests more cores per rank than are available on a node"
+)
+ERR_NO_SYS_GPUS = (
+    "Experiment requests GPUs, but sys_gpus_per_node is not specified for the system"
+)
+ERR_MAX_REQUEST = "Request exceeds maximum: {var}/{val}/{max_request}"
+
+#: The variables that solve_allocations fills in
+SOLVED_VARIABLES = ("n_ranks", "n_nodes", "n_threads_per_proc")
+
+
+def _is_column(values):
+    return hasattr(values, "__len__") and not isinstance(values, str)
+
+
+def _solve_one(r):
+    """Fill in the solved variables of one experiment, given as a dict where
+    unset values are 0. Returns why it can't be allocated, or None.
+    """
+    if not r["n_ranks"]:
+        if r["n_ranks_per_node"] and r["n_nodes"]:
+            r["n_ranks"] = r["n_nodes"] * r["n_ranks_per_node"]
+        # TODO: elif n_gpus_per_node and n_nodes
+        elif r["n_gpus"]:
+            r["n_ranks"] = r["n_gpus"]
+
+    if not r["n_nodes"]:
+        if not any((r["n_ranks"], r["n_gpus"])):
+            return ERR_NO_REQUEST
+        cores_node_request = 0
+        if r["n_ranks"]:
+            cores_request_per_rank = max(
+                r["n_cores_per_rank"] or r["n_threads_per_proc"], 1
+            )
+            ranks_per_node = r["sys_cores_per_node"] // cores_request_per_rank
+            if ranks_per_node == 0:
+                return ERR_CORES_PER_RANK
+            cores_node_request = -(-r["n_ranks"] // ranks_per_node)
+        gpus_node_request = 0
+        if r["n_gpus"]:
+            if not r["sys_gpus_per_node"]:
+                return ERR_NO_SYS_GPUS
+            gpus_node_request = -(-r["n_gpus"] // r["sys_gpus_per_node"])
+        r["n_nodes"] = max(cores_node_request, gpus_node_request)
+
+    if not r["n_threads_per_proc"]:
+        r["n_threads_per_proc"] = 1
+
+    max_request = r["max_request"] or 1000
+    for var, val in r.items():
+        if val > max_request:
+            return ERR_MAX_REQUEST.format(var=var, val=val, max_request=max_request)
+    return None
+
+
+def _solve_python(columns, n):
+    columns = {
+        name: [x or 0 for x in column] if _is_column(column) else [column] * n
+        for name, column in columns.items()
+    }
+    solved = {name: [0] * n for name in columns}
+    errors = {}
+    for i in range(n):
+        r = {name: column[i] for name, column in columns.items()}
+        error = _solve_one(r)
+        if error:
+            errors[i] = error
+        for name, val in r.items():
+            solved[name][i] = val
+    return solved, errors
+
+
+def _solve_numpy(columns, n):
+    c = {}
+    for name, column in columns.items():
+        if _is_column(column) and not isinstance(column, numpy.ndarray):
+            column = [x or 0 for x in column]
+        c[name] = numpy.broadcast_to(numpy.asarray(column, dtype=numpy.int64), (n,))
+    solved = dict(c)
+    failed = numpy.zeros(n, dtype=bool)
+    errors = {}
+
+    def fail(condition, message):
+        condition = condition & ~failed
+        for i in numpy.flatnonzero(condition):
+            errors[int(i)] = message
+        failed[condition] = True
+
+    n_ranks = c["n_ranks"].copy()
+    unset = n_ranks == 0
+    by_node = unset & (c["n_ranks_per_node"] != 0) & (c["n_nodes"] != 0)
+    n_ranks[by_node] = (c["n_nodes"] * c["n_ranks_per_node"])[by_node]
+    by_gpu = unset & ~by_node & (c["n_gpus"] != 0)
+    n_ranks[by_gpu] = c["n_gpus"][by_gpu]
+    solved["n_ranks"] = n_ranks
+
+    need_nodes = c["n_nodes"] == 0
+    fail(need_nodes & (n_ranks == 0) & (c["n_gpus"] == 0), ERR_NO_REQUEST)
+
+    cores_request_per_rank = numpy.maximum(
+        numpy.where(
+            c["n_cores_per_rank"] != 0, c["n_cores_per_rank"], c["n_threads_per_proc"]
+        ),
+        1,
+    )
+    ranks_per_node = c["sys_cores_per_node"] // cores_request_per_rank
+    by_cores = need_nodes & (n_ranks != 0)
+    fail(by_cores & (ranks_per_node == 0), ERR_CORES_PER_RANK)
+    cores_node_request = numpy.where(
+        by_cores, -(-n_ranks // numpy.maximum(ranks_per_node, 1)), 0
+    )
+
+    by_gpus = need_nodes & (c["n_gpus"] != 0)
+    fail(by_gpus & (c["sys_gpus_per_node"] == 0), ERR_NO_SYS_GPUS)
+    gpus_node_request = numpy.where(
+        by_gpus, -(-c["n_gpus"] // numpy.maximum(c["sys_gpus_per_node"], 1)), 0
+    )
+    solved["n_nodes"] = numpy.where(
+        need_nodes & ~failed,
+        numpy.maximum(cores_node_request, gpus_node_request),
+        c["n_nodes"],
+    )
+    solved["n_threads_per_proc"] = numpy.where(
+        c["n_threads_per_proc"] == 0, 1, c["n_threads_per_proc"]
+    )
+
+    max_request = numpy.where(c["max_request"] == 0, 1000, c["max_request"])
+    for var, column in solved.items():
+        over = (column > max_request) & ~failed
+        for i in numpy.flatnonzero(over):
+            errors[int(i)] = ERR_MAX_REQUEST.format(
+                var=var, val=column[i], max_request=max_request[i]
+            )
+        failed |= over
+
+    return solved, errors
+
+
+def solve_allocations(requests, use_numpy=None):
+    """Determine n_ranks, n_nodes and n_threads_per_proc for many experiments
+    at once, following the same rules as Allocation.determine_allocation.
+
+    Args:
+        requests: dict from each integer allocation option (e.g. n_ranks,
+            sys_cores_per_node, max_request) to either a list (or array)
+            with a value for each experiment, or one value for all of them.
+            None and 0 mean the option is unset.
+        use_numpy: whether to solve with array operations. By default, this
+            is done if NumPy is available.
+
+    Returns:
+        A dict with a list (or array) of the value for each experiment for
+        every option (0 where it is unset), and a dict from the index of each experiment that
+        cannot be allocated to why. Every option is checked against
+        max_request.
+    """
+    n = max((len(x) for x in requests.values() if _is_column(x)), default=1)
+    columns = {}
+    for name, values in requests.items():
+        if _is_column(values) and len(values) != n:
+            raise ValueError(f"Expected {n} values for {name}, got {len(values)}")
+        columns[name] = values if _is_column(values) else values or 0
+    for alloc_opt in AllocOpt:
+        if AllocOpt.is_int(alloc_opt):
+            columns.setdefault(alloc_opt.name.lower(), 0)
+
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy:
+        return _solve_numpy(columns, n)
+    return _solve_python(columns, n)
+
+
+# In packed and array mode, each experiment script has a line like
+# "# benchpark-submit: mode=packed n_nodes=2 timeout=120" so that
+# `benchpark submit` can group the experiments of a workspace into jobs
+SUBMIT_HEADER = "# benchpark-submit:"
+
+#: The modes where experiments are submitted by `benchpark submit`, and the
+#: schedulers each one supports
+GROUPED_MODES = {
+    "packed": ["slurm", "flux"],
+    "array": ["slurm", "flux", "lsf"],
+}
+
+#: How batch directives start in a script, for each scheduler
+DIRECTIVE_PREFIXES = {
+    "slurm": "#SBATCH",
+    "flux": "# flux:",
+    "lsf": "#BSUB",
+    "pjm": "#PJM",
+}
+
+
+def submit_header(mode, v):
+    return f"{SUBMIT_HEADER} mode={mode} n_nodes={v.n_nodes} timeout={v.timeout}"
+
+
+def parse_submit_header(script):
+    """The mode, n_nodes and timeout in the submit header of an experiment
+    script (as a dict), or None if it has no header.
+    """
+    for line in script.splitlines():
+        if line.startswith(SUBMIT_HEADER):
+            fields = dict(x.split("=", 1) for x in line[len(SUBMIT_HEADER) :].split())
+            fields["n_nodes"] = int(fields["n_nodes"])
+            fields["timeout"] = int(fields["timeout"])
+            return fields
+    return None
+
+
+def batch_directives(scheduler, script):
+    """The batch directive lines in a script."""
+    prefix = DIRECTIVE_PREFIXES[scheduler]
+    return tuple(x for x in script.splitlines() if x.startswith(prefix))
+
+
+#: The packed driver script sets this to the first node of the allocation
+#: (counting from 0) that each experiment it starts may use
+NODE_OFFSET_VAR = "BENCHPARK_NODE_OFFSET"
+
+
+class PackedAllocation:
+    """Experiments that run in one allocation. Each shelf is a list of
+    experiments that run at the same time, on separate nodes; shelves run
+    one after another. ``node_offsets`` has the first node of each
+    experiment, shelf by shelf.
+    """
+
+    def __init__(self):
+        self.shelves = []
+        self.node_offsets = []
+        self.n_nodes = 0
+        self.timeout = 0
+
+    def add_shelf(self, shelf, node_offsets, n_nodes, timeout):
+        self.shelves.append(shelf)
+        self.node_offsets.append(node_offsets)
+        self.n_nodes = max(self.n_nodes, n_nodes)
+        self.timeout += timeout
+
+
+def pack_experiments(experiments, max_nodes, max_timeout):
+    """Pack experiments into as few allocations as possible.
+
+    Experiments are sorted by timeout, longest first, and placed on the
+    first shelf that has enough nodes left, or on a new shelf. Each shelf
+    then goes into the first allocation with enough time left.
+
+    Args:
+        experiments: (n_nodes, timeout, experiment) for each experiment,
+            with the timeout in minutes
+        max_nodes: the most nodes that an allocation can have
+        max_timeout: the longest that an allocation can run, in minutes
+
+    Returns:
+        A list of PackedAllocation
+    """
+    shelves = []
+    for n_nodes, timeout, experiment in sorted(
+        experiments, key=lambda x: (x[1], x[0]), reverse=True
+    ):
+        if n_nodes > max_nodes or timeout > max_timeout:
+            raise ValueError(
+                f"Experiment needs {n_nodes} nodes for {timeout} minutes, "
+                f"which is more than an allocation can have ({max_nodes} "
+                f"nodes, {max_timeout} minutes)"
+            )
+        for shelf in shelves:
+            if shelf["n_nodes"] + n_nodes <= max_nodes:
+                break
+        else:
+            shelf = {"n_nodes": 0, "timeout": timeout, "experiments": [], "offsets": []}
+            shelves.append(shelf)
+        shelf["offsets"].append(shelf["n_nodes"])
+        shelf["n_nodes"] += n_nodes
+        shelf["experiments"].append(experiment)
+
+    allocations = []
+    for shelf in shelves:
+        for allocation in allocations:
+            if allocation.timeout + shelf["timeout"] <= max_timeout:
+                break
+        else:
+            allocation = PackedAllocation()
+            allocations.append(allocation)
+        allocation.add_shelf(
+            shelf["experiments"], shelf["offsets"], shelf["n_nodes"], shelf["timeout"]
+        )
+    return allocations
+
+
+def packed_driver_script(v, allocation):
+    """A batch script that runs the experiment scripts of a PackedAllocation,
+    and the command to submit it (without the script path). ``v`` holds the
+    options of the system (scheduler, extra_batch_opts, ...).
+    """
+    batch_opts, _ = Allocation._init_batch_and_cmd_opts(v)
+    if v.scheduler == "slurm":
+        opts = [f"-N {allocation.n_nodes}", f"--time {allocation.timeout}"]
+        directives = list(f"#SBATCH {x}" for x in (opts + batch_opts))
+        submit = "sbatch"
+    elif v.scheduler == "flux":
+        opts = [f"-N {allocation.n_nodes}", "--exclusive", f"-t {allocation.timeout}m"]
+        directives = list(f"# flux: {x}" for x in (opts + batch_opts))
+        submit = "flux batch"
+    else:
+        raise ValueError(
+            f"Packing is only supported for slurm and flux (not {v.scheduler})"
+        )
+
+    lines = ["#!/bin/bash"] + directives
+    for i, (shelf, offsets) in enumerate(
+        zip(allocation.shelves, allocation.node_offsets)
+    ):
+        lines.append("")
+        lines.append(f"# Shelf {i + 1}: these run at the same time")
+        lines.extend(
+            f"{NODE_OFFSET_VAR}={offset} bash {script} &"
+            for script, offset in zip(shelf, offsets)
+        )
+        lines.append("wait")
+    return "\n".join(lines) + "\n", submit
+
+
+def array_groups(experiments):
+    """Group experiments that request the same resources.
+
+    Args:
+        experiments: (batch directives, experiment) for each experiment
+
+    Returns:
+        A list of (batch directives, [experiment, ...]), in the order each
+        set of directives first appears
+    """
+    groups = {}
+    for directives, experiment in experiments:
+        groups.setdefault(tuple(directives), []).append(experiment)
+    return list(groups.items())
+
+
+#: For each scheduler: the directive that makes a script a job array of
+#: ``count`` tasks, the expression for the index of a task, and the
+#: command to submit the script (without its path)
+_ARRAY_JOBS = {
+    "slurm": (
+        "#SBATCH --array=0-{last}",
+        "$SLURM_ARRAY_TASK_ID",
+        "sbatch",
+    ),
+    "lsf": (
+        '#BSUB -J "benchpark[1-{count}]"',
+        "$((LSB_JOBINDEX - 1))",
+        "bsub",
+    ),
+    "flux": (None, "$FLUX_JOB_CC", "flux batch --cc=0-{last}"),
+}
+
+
+def array_driver_script(scheduler, directives, mapping_file, count):
+    """A batch script for a job array that runs one experiment script per
+    task, and the command to submit it (without the script path).
+
+    ``mapping_file`` has a line "<index>\t<experiment script>" for each
+    of the ``count`` tasks, with indices starting at 0.
+    """
+    if scheduler not in _ARRAY_JOBS:
+        raise ValueError(
+            f"Job arrays are only supported for {', '.join(_ARRAY_JOBS)} "
+            f"(not {scheduler})"
+        )
+    array_directive, index, submit = _ARRAY_JOBS[scheduler]
+    lines = ["#!/bin/bash"] + list(directives)
+    if array_directive:
+        lines.append(array_directive.format(last=count - 1, count=count))
+    lines.extend(
+        [
+            "",
+            f"index={index}",
+            f"script=$(awk -F '\\t' -v i=\"$index\" '$1 == i {{print $2}}' "
+            f"{mapping_file})",
+            'exec bash "$script"',
+        ]
+    )
+    return "\n".join(lines) + "\n", submit.format(last=count - 1, count=count)
+
+
 class Allocation(BasicModifier):
 
     name = "allocation"
 
     tags("infrastructure")
 
-    # Currently there is only one mode. The only behavior supported right
-    # now is to attempt to request "enough" resources for a given
+    # The standard mode attempts to request "enough" resources for a given
     # request (e.g. to make sure we request enough nodes, assuming we
-    # know how many CPUs we want)"
+    # know how many CPUs we want), in a separate job for each experiment.
     mode("standard", description="Standard execution mode for allocation")
+    # Packed mode sizes experiments the same way, but `benchpark submit`
+    # packs them into a few allocations (see pack_experiments) instead
+    mode(
+        "packed",
+        description="Run experiments together in as few allocations as possible, "
+        "with `benchpark submit`",
+    )
+    # Array mode submits experiments that request the same resources as one
+    # job array, with `benchpark submit` (see array_groups)
+    mode(
+        "array",
+        description="Submit experiments with the same resource requests as one "
+        "job array, with `benchpark submit`",
+    )
     default_mode("standard")
 
     def inherit_from_application(self, app):
@@ -241,6 +706,9 @@ class Allocation(BasicModifier):
 
         self.determine_scheduler_instructions(v)
 
+        if self._usage_mode in GROUPED_MODES:
+            self.grouped_submit_instructions(v, self._usage_mode)
+
         # Definitions
         for var, val in v.defined():
             # print(f"<--- Define {str(var)} = {str(val)}")
@@ -249,61 +717,22 @@ class Allocation(BasicModifier):
             app.define_variable(var, str(val))
 
         if v.n_threads_per_proc:
-            self.env_var_modification(
-                "OMP_NUM_THREADS",
-                method="set",
-                modification="{n_threads_per_proc}",
-                mode="standard",
-            )
+            for mode_name in ["standard"] + list(GROUPED_MODES):
+                self.env_var_modification(
+                    "OMP_NUM_THREADS",
+                    method="set",
+                    modification="{n_threads_per_proc}",
+                    mode=mode_name,
+                )
 
     def determine_allocation(self, v):
-        if not v.n_ranks:
-            if v.n_ranks_per_node and v.n_nodes:
-                v.n_ranks = v.n_nodes * v.n_ranks_per_node
-            # TODO: elif n_gpus_per_node and n_nodes
-            elif v.n_gpus:
-                v.n_ranks = v.n_gpus
-
-        if not v.n_nodes:
-            if not any((v.n_ranks, v.n_gpus)):
-                raise ValueError("Must specify one of: n_nodes, n_ranks, n_gpus")
-            cores_node_request = None
-            if v.n_ranks:
-                multi_cores_per_rank = v.n_cores_per_rank or v.n_threads_per_proc or 0
-                cores_request_per_rank = max(multi_cores_per_rank, 1)
-                ranks_per_node = math.floor(
-                    v.sys_cores_per_node / cores_request_per_rank
-                )
-                if ranks_per_node == 0:
-                    raise ValueError(
-                        "Experiment requests more cores per rank than "
-                        "are available on a node"
-                    )
-                cores_node_request = math.ceil(v.n_ranks / ranks_per_node)
-            gpus_node_request = None
-            if v.n_gpus:
-                if v.sys_gpus_per_node:
-                    gpus_node_request = math.ceil(v.n_gpus / float(v.sys_gpus_per_node))
-                else:
-                    raise ValueError(
-                        "Experiment requests GPUs, but sys_gpus_per_node "
-                        "is not specified for the system"
-                    )
-            v.n_nodes = max(cores_node_request or 0, gpus_node_request or 0)
-
-        if not v.n_threads_per_proc:
-            v.n_threads_per_proc = 1
-
-        max_request = v.max_request or 1000
-        # Final check, make sure the above arithmetic didn't result in an
-        # unreasonable allocation request.
-        for var, val in v.defined():
-            try:
-                int(val)
-            except (ValueError, TypeError):
-                continue
-            if val > max_request:
-                raise ValueError(f"Request exceeds maximum: {var}/{val}/{max_request}")
+        requests = dict((var, val) for var, val in v.defined() if isinstance(val, int))
+        # For one experiment, building arrays costs more than it saves
+        solved, errors = solve_allocations(requests, use_numpy=False)
+        if errors:
+            raise ValueError(errors[0])
+        for var in SOLVED_VARIABLES:
+            setattr(v, var, solved[var][0] or None)
 
     def slurm_instructions(self, v):
         sbatch_opts, srun_opts = Allocation._init_batch_and_cmd_opts(v)
@@ -320,6 +749,12 @@ class Allocation(BasicModifier):
 
         sbatch_directives = list(f"#SBATCH {x}" for x in (srun_opts + sbatch_opts))
 
+        if self._usage_mode == "packed":
+            # Packed experiments run at the same time in one allocation:
+            # --exclusive only keeps job steps from sharing CPUs, so each
+            # one also starts at its own node, which the driver script sets
+            srun_opts.append(f"--exclusive --relative=${NODE_OFFSET_VAR}")
+
         v.mpi_command = f"srun {' '.join(srun_opts)}"
         v.batch_submit = "sbatch {execute_experiment}"
         v.allocation_directives = "\n".join(sbatch_directives)
@@ -375,6 +810,8 @@ class Allocation(BasicModifier):
             cmd_opts.append(f"-n {v.n_ranks}")
         if v.n_nodes:
             cmd_opts.append(f"-N {v.n_nodes}")
+            # This also keeps packed experiments, which run at the same time
+            # in one allocation, from sharing nodes
             cmd_opts.append("--exclusive")
         if v.n_gpus:
             gpus_per_rank = 1  # self.gpus_as_gpus_per_rank(v)
@@ -443,6 +880,18 @@ class Allocation(BasicModifier):
         v.batch_submit = "pjsub {execute_experiment}"
         v.allocation_directives = "\n".join(batch_directives)
 
+    def grouped_submit_instructions(self, v, mode):
+        """Experiments are submitted together by `benchpark submit`, which
+        reads their size from the submit header.
+        """
+        if v.scheduler not in GROUPED_MODES[mode]:
+            raise ValueError(
+                f"The {mode} mode is only supported for "
+                f"{', '.join(GROUPED_MODES[mode])} (not {v.scheduler})"
+            )
+        v.allocation_directives = f"{submit_header(mode, v)}\n{v.allocation_directives}"
+        v.batch_submit = f"echo Experiments in {mode} mode are run by: benchpark submit"
+
     def determine_scheduler_instructions(self, v):
         handler = {
             "slurm": self.slurm_instructions,
@@ -3,9 +3,7 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
-import os
 import pathlib
-import tempfile
 
 from benchpark.directives import variant
 from benchpark.system import System
@@ -113,24 +111,10 @@ packages:
     externals:
 {cfg}
 """
-        gen_file = self.next_adhoc_cfg()
-        with open(gen_file, "w") as f:
-            f.write(full_cfg)
-        selections.append(gen_file)
+        selections.append(self.adhoc_cfg(full_cfg))
 
         return selections
 
-    def _adhoc_cfgs(self):
-        if not getattr(self, "_tmp_cfgs", None):
-            self._tmp_cfgs = tempfile.mkdtemp()
-            self._adhoc_cfg_idx = 0
-        return self._tmp_cfgs
-
-    def next_adhoc_cfg(self):
-        basedir = self._adhoc_cfgs()
-        self._adhoc_cfg_idx += 1
-        return os.path.join(basedir, str(self._adhoc_cfg_idx))
-
     def compiler_configs(self):
         # values=("clang-ibm", "xl", "xl-gcc", "clang"),
         # values=("11-8-0", "10-1-243"),
@@ -249,11 +233,7 @@ packages:
 compilers:
 {cfg}
 """
-        gen_file = self.next_adhoc_cfg()
-        with open(gen_file, "w") as f:
-            f.write(full_cfg)
-
-        selections = [gen_file]
+        selections = [self.adhoc_cfg(full_cfg)]
         return selections
 
     def sw_description(self):